@@ -0,0 +1,256 @@
+"""Per-stage CPU benchmark of the image generation path
+
+Runs ImageGenerator's Compel encoding and the SDXL denoising, decode and output
+encoding stages against a tiny randomly initialised pipeline (see tiny_pipeline.py),
+for every configured aspect ratio, and writes the timings as JSON.
+
+Absolute numbers say nothing about a real checkpoint; compare runs of the same
+machine across commits instead:
+
+    python benchmarks/bench_generation.py --output before.json
+    python benchmarks/bench_generation.py --output after.json --compare before.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.image_generator import ImageGenerator
+from src.utils.constants import (
+    get_aspect_ratios, get_quality_steps, get_positive_prompt, get_negative_prompt,
+    get_guidance_scale, get_output_formats
+)
+from src.utils.image_encoder import image_encoder
+from tiny_pipeline import build_tiny_pipeline
+
+DEFAULT_PROMPT = "a girl standing in a field of flowers at sunset, detailed background"
+
+def measure(function: Callable[[], object], repeats: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        function()
+
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3)
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def bench_text_encoding(generator: ImageGenerator, prompt: str, repeats: int) -> Dict[str, Dict[str, float]]:
+    full_prompt = prompt + get_positive_prompt()
+    return {
+        "compel_positive": measure(lambda: generator._process_prompt_with_compel(full_prompt), repeats),
+        "compel_negative": measure(lambda: generator._process_negative_prompt_with_compel(get_negative_prompt()), repeats)
+    }
+
+@torch.no_grad()
+def bench_resolution(generator: ImageGenerator, prompt: str, width: int, height: int,
+                     batch_size: int, repeats: int, output_dir: str) -> Dict[str, Dict[str, float]]:
+    pipeline = generator.pipeline
+    conditioning, pooled = generator._process_prompt_with_compel(prompt + get_positive_prompt())
+    negative_conditioning, negative_pooled = generator._process_negative_prompt_with_compel(get_negative_prompt())
+    conditioning, negative_conditioning = generator.compel.pad_conditioning_tensors_to_same_length(
+        [conditioning, negative_conditioning]
+    )
+
+    # Classifier-free guidance runs the UNet on [negative, positive] in one batch, as the pipeline does
+    encoder_hidden_states = torch.cat([negative_conditioning, conditioning]).repeat_interleave(batch_size, dim=0)
+    text_embeds = torch.cat([negative_pooled, pooled]).repeat_interleave(batch_size, dim=0)
+    time_ids = torch.tensor([[height, width, 0, 0, height, width]], dtype=torch.float32).repeat(2 * batch_size, 1)
+    added_cond_kwargs = {"text_embeds": text_embeds, "time_ids": time_ids}
+
+    scheduler = pipeline.scheduler
+    scheduler.set_timesteps(max(get_quality_steps().values()))
+    timestep = scheduler.timesteps[len(scheduler.timesteps) // 2]
+    latents = torch.randn(
+        (batch_size, pipeline.unet.config.in_channels, height // pipeline.vae_scale_factor, width // pipeline.vae_scale_factor),
+        generator=torch.Generator(device="cpu").manual_seed(0)
+    )
+    guidance_scale = get_guidance_scale()
+
+    def unet_step():
+        latent_model_input = scheduler.scale_model_input(torch.cat([latents] * 2), timestep)
+        noise_pred = pipeline.unet(
+            latent_model_input, timestep,
+            encoder_hidden_states=encoder_hidden_states,
+            added_cond_kwargs=added_cond_kwargs,
+            return_dict=False
+        )[0]
+        noise_uncond, noise_text = noise_pred.chunk(2)
+        return noise_uncond + guidance_scale * (noise_text - noise_uncond)
+
+    noise_pred = unet_step()
+
+    def scheduler_step():
+        # Euler ancestral advances an internal step index, so rewind it to keep every sample identical
+        scheduler._step_index = None
+        return scheduler.step(noise_pred, timestep, latents, return_dict=False)[0]
+
+    def vae_decode():
+        return pipeline.vae.decode(latents / pipeline.vae.config.scaling_factor, return_dict=False)[0]
+
+    decoded = vae_decode()
+    images = pipeline.image_processor.postprocess(decoded, output_type="pil")
+
+    stages = {
+        "unet_step": measure(unet_step, repeats),
+        "scheduler_step": measure(scheduler_step, repeats),
+        "vae_decode": measure(vae_decode, repeats),
+        "postprocess": measure(lambda: pipeline.image_processor.postprocess(decoded, output_type="pil"), repeats)
+    }
+
+    for name, preset in get_output_formats().items():
+        extension, options = image_encoder.resolve_preset(preset)
+        image = images[0].convert("RGB") if options["format"] == "JPEG" else images[0]
+
+        def encode():
+            buffer = io.BytesIO()
+            image.save(buffer, **options)
+            return buffer.getvalue()
+
+        encoded = encode()
+        path = os.path.join(output_dir, f"benchmark.{extension}")
+
+        def write():
+            with open(path, 'wb') as f:
+                f.write(encoded)
+
+        stages[f"encode_{name}"] = measure(encode, repeats)
+        stages[f"encode_{name}"]["bytes"] = len(encoded)
+        stages[f"write_{name}"] = measure(write, repeats)
+
+    return stages
+
+def estimate_totals(text_stages: Dict, stages: Dict) -> Dict[str, float]:
+    """Median end-to-end time per quality preset, composed from the per-stage medians"""
+    fixed = (
+        text_stages["compel_positive"]["median_ms"]
+        + stages["vae_decode"]["median_ms"]
+        + stages["postprocess"]["median_ms"]
+    )
+    per_step = stages["unet_step"]["median_ms"] + stages["scheduler_step"]["median_ms"]
+    return {quality: round(fixed + steps * per_step, 3) for quality, steps in get_quality_steps().items()}
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """Describe stages whose median moved by more than threshold percent against the baseline"""
+    lines = []
+
+    def compare_stages(label: str, old_stages: Dict, new_stages: Dict):
+        for stage, new in new_stages.items():
+            old = old_stages.get(stage)
+            if old is None or not old.get("median_ms"):
+                continue
+            change = (new["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+            if abs(change) >= threshold:
+                kind = "REGRESSION" if change > 0 else "improvement"
+                lines.append(
+                    f"{kind}: {label} {stage} {old['median_ms']:.2f}ms -> {new['median_ms']:.2f}ms ({change:+.1f}%)"
+                )
+
+    compare_stages("text", baseline.get("text_encoding", {}), current["text_encoding"])
+    old_resolutions = {result["aspect_ratio"]: result for result in baseline.get("resolutions", [])}
+    for result in current["resolutions"]:
+        old = old_resolutions.get(result["aspect_ratio"])
+        if old is not None:
+            compare_stages(result["aspect_ratio"], old["stages"], result["stages"])
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the LUMIERE generation path on CPU")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--aspect-ratio", action="append", help="limit to these configured aspect ratios")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change reported by --compare")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    aspect_ratios = get_aspect_ratios()
+    selected = args.aspect_ratio or list(aspect_ratios)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pipeline = build_tiny_pipeline(
+            os.path.join(work_dir, "pipeline"),
+            corpus=[args.prompt, get_positive_prompt(), get_negative_prompt()]
+        )
+        generator = ImageGenerator(device="cpu", name="benchmark")
+        generator.pipeline = pipeline
+        generator.compel = generator._create_compel()
+
+        text_stages = bench_text_encoding(generator, args.prompt, args.repeats)
+        resolutions = []
+        for aspect_ratio in selected:
+            width, height = aspect_ratios[aspect_ratio]
+            print(f"Benchmarking {aspect_ratio} ({width}x{height})", file=sys.stderr)
+            stages = bench_resolution(generator, args.prompt, width, height, args.batch_size, args.repeats, work_dir)
+            resolutions.append({
+                "aspect_ratio": aspect_ratio,
+                "width": width,
+                "height": height,
+                "stages": stages,
+                "estimated_total_ms": estimate_totals(text_stages, stages)
+            })
+
+    report = {
+        "revision": git_revision(),
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "batch_size": args.batch_size,
+        "repeats": args.repeats,
+        "quality_steps": get_quality_steps(),
+        "text_encoding": text_stages,
+        "resolutions": resolutions
+    }
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        changes = compare(baseline, report, args.threshold)
+        for line in changes:
+            print(line, file=sys.stderr)
+        if not changes:
+            print(f"No stage moved by more than {args.threshold}% against {args.compare}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
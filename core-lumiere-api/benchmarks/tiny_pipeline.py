@@ -0,0 +1,118 @@
+import json
+import os
+import re
+from typing import Iterable
+
+import torch
+from diffusers import AutoencoderKL, EulerAncestralDiscreteScheduler, StableDiffusionXLPipeline, UNet2DConditionModel
+from transformers import CLIPTextConfig, CLIPTextModel, CLIPTextModelWithProjection, CLIPTokenizer
+from transformers.models.clip.tokenization_clip import bytes_to_unicode
+
+BOS_TOKEN = "<|startoftext|>"
+EOS_TOKEN = "<|endoftext|>"
+
+def write_tokenizer_files(directory: str, corpus: Iterable[str] = ()) -> CLIPTokenizer:
+    """Write a byte-level CLIP vocabulary plus merges that make each word in corpus a single token
+
+    Without merges every character would be its own token, which would overstate
+    prompt lengths (and Compel's chunking work) compared with the real tokenizer.
+    """
+    os.makedirs(directory, exist_ok=True)
+    vocab = {}
+    for character in bytes_to_unicode().values():
+        vocab[character] = len(vocab)
+        vocab[character + "</w>"] = len(vocab)
+
+    merges = []
+    for word in sorted({word for text in corpus for word in re.findall(r"[a-z]+", text.lower())}):
+        pieces = list(word[:-1]) + [word[-1] + "</w>"]
+        current = pieces[0]
+        for piece in pieces[1:]:
+            merges.append(f"{current} {piece}")
+            current += piece
+            vocab.setdefault(current, len(vocab))
+    vocab[BOS_TOKEN] = len(vocab)
+    vocab[EOS_TOKEN] = len(vocab)
+
+    vocab_file = os.path.join(directory, "vocab.json")
+    merges_file = os.path.join(directory, "merges.txt")
+    with open(vocab_file, 'w', encoding='utf-8') as f:
+        json.dump(vocab, f)
+    with open(merges_file, 'w', encoding='utf-8') as f:
+        f.write("#version: 0.2\n")
+        f.write("\n".join(dict.fromkeys(merges)))
+
+    return CLIPTokenizer(vocab_file, merges_file, model_max_length=77)
+
+def build_tiny_pipeline(directory: str, corpus: Iterable[str] = (), seed: int = 0) -> StableDiffusionXLPipeline:
+    """Randomly initialised SDXL pipeline with real component types and an 8x VAE, small enough for CPU"""
+    torch.manual_seed(seed)
+    tokenizer = write_tokenizer_files(os.path.join(directory, "tokenizer"), corpus)
+
+    text_config = CLIPTextConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=32,
+        intermediate_size=37,
+        num_attention_heads=4,
+        num_hidden_layers=5,
+        projection_dim=32,
+        hidden_act="gelu",
+        layer_norm_eps=1e-05,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id
+    )
+    text_encoder = CLIPTextModel(text_config)
+    text_encoder_2 = CLIPTextModelWithProjection(text_config)
+
+    # cross_attention_dim is both text encoders' hidden states concatenated; the added
+    # embedding input is 6 time ids * addition_time_embed_dim + the pooled projection
+    unet = UNet2DConditionModel(
+        block_out_channels=(32, 64),
+        layers_per_block=2,
+        sample_size=32,
+        in_channels=4,
+        out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        attention_head_dim=(2, 4),
+        use_linear_projection=True,
+        addition_embed_type="text_time",
+        addition_time_embed_dim=8,
+        transformer_layers_per_block=(1, 2),
+        projection_class_embeddings_input_dim=6 * 8 + 32,
+        cross_attention_dim=64
+    )
+
+    vae = AutoencoderKL(
+        block_out_channels=(32, 32, 32, 32),
+        in_channels=3,
+        out_channels=3,
+        down_block_types=("DownEncoderBlock2D",) * 4,
+        up_block_types=("UpDecoderBlock2D",) * 4,
+        latent_channels=4,
+        layers_per_block=1,
+        sample_size=128,
+        scaling_factor=0.13025
+    )
+
+    scheduler = EulerAncestralDiscreteScheduler(
+        beta_start=0.00085,
+        beta_end=0.012,
+        beta_schedule="scaled_linear",
+        steps_offset=1,
+        timestep_spacing="leading"
+    )
+
+    pipeline = StableDiffusionXLPipeline(
+        vae=vae,
+        text_encoder=text_encoder,
+        text_encoder_2=text_encoder_2,
+        tokenizer=tokenizer,
+        tokenizer_2=tokenizer,
+        unet=unet,
+        scheduler=scheduler,
+        add_watermarker=False
+    )
+    pipeline.set_progress_bar_config(disable=True)
+    return pipeline
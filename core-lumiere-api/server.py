@@ -2,8 +2,9 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import uvicorn
 
-from src.api.routes import router
+from src.api.routes import router, queue_manager
 from src.utils.logger import get_logger, start_log_archiving
+from src.utils.tracing import tracer
 from src.utils.config import config, ConfigError
 import sys
 
@@ -13,7 +14,11 @@ logger = get_logger(__name__)
 async def lifespan(app: FastAPI):
     logger.info("LUMIERE API server has been activated.")
     start_log_archiving()
+    if queue_manager.journal is not None:
+        await queue_manager.initialize()
     yield
+    await queue_manager.shutdown()
+    tracer.close()
     logger.info("LUMIERE API server has been deactivated.")
 
 def create_app() -> FastAPI:
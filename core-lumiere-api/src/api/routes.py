@@ -1,82 +1,187 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from typing import Optional, Set
+from fastapi.responses import FileResponse, PlainTextResponse
 import uuid
 import asyncio
 
 from ..api.schemas import GenerationRequest, GenerationResponse
-from ..services.queue_manager import QueueManager
+from ..services.queue_manager import QueueManager, AdmissionRejected, TERMINAL_STATUSES
 from ..services.websocket_manager import WebSocketManager
 from ..utils.logger import get_output_dir
+from ..utils.image_encoder import get_media_type
+from ..utils.metrics import metrics, tasks_rejected_total
+from ..utils.tracing import tracer
 
 router = APIRouter()
 queue_manager = QueueManager()
 websocket_manager = WebSocketManager()
 
+metrics.gauge(
+    "lumiere_queue_depth", "Tasks waiting in the queue",
+    callback=lambda: len(queue_manager.task_queue) if queue_manager.task_queue is not None else 0
+)
+metrics.gauge(
+    "lumiere_tasks_in_flight", "Tasks currently being generated",
+    callback=lambda: len(queue_manager.in_flight_tasks)
+)
+metrics.gauge(
+    "lumiere_websocket_connections", "Open status websocket connections",
+    callback=lambda: sum(len(connections) for connections in websocket_manager.connections.values())
+)
+metrics.gauge(
+    "lumiere_status_streams", "Open multiplexed status websocket connections",
+    callback=lambda: len(websocket_manager.streams)
+)
+metrics.gauge(
+    "lumiere_task_store_tasks", "Tasks held in the task store", ("state",),
+    callback=lambda: {
+        (state,): queue_manager.get_task_store_stats()[state] for state in ("active", "finished")
+    }
+)
+metrics.counter(
+    "lumiere_task_store_evictions_total", "Finished tasks evicted from the task store", ("reason",),
+    callback=lambda: {
+        ("ttl",): queue_manager.tasks.ttl_evictions,
+        ("capacity",): queue_manager.tasks.capacity_evictions
+    }
+)
+metrics.gauge(
+    "lumiere_task_store_resident_bytes", "Estimated memory held by task store entries",
+    callback=lambda: queue_manager.tasks.resident_bytes
+)
+
+def _cache_stats(field: str) -> dict:
+    """One sample per cache: the result cache plus each generator's conditioning cache"""
+    samples = {}
+    result_stats = queue_manager.get_result_cache_stats()
+    if result_stats is not None:
+        samples[("result", "")] = result_stats[field]
+    for generator, stats in queue_manager.get_conditioning_cache_stats().items():
+        samples[("conditioning", generator)] = stats[field]
+    return samples
+
+CACHE_LABELS = ("cache", "generator")
+
+metrics.counter("lumiere_cache_hits_total", "Cache lookups that found an entry", CACHE_LABELS,
+                callback=lambda: _cache_stats("hits"))
+metrics.counter("lumiere_cache_misses_total", "Cache lookups that found nothing", CACHE_LABELS,
+                callback=lambda: _cache_stats("misses"))
+metrics.counter("lumiere_cache_evictions_total", "Entries evicted to stay within the cache bounds", CACHE_LABELS,
+                callback=lambda: _cache_stats("evictions"))
+metrics.gauge("lumiere_cache_entries", "Entries held in the cache", CACHE_LABELS,
+              callback=lambda: _cache_stats("entries"))
+metrics.gauge("lumiere_cache_bytes", "Bytes held by the cache", CACHE_LABELS,
+              callback=lambda: _cache_stats("bytes"))
+
 @router.post("/generator", response_model=GenerationResponse)
-async def generate_image(request: GenerationRequest):
+async def generate_image(request: GenerationRequest, http_request: Request,
+                         x_trace_id: Optional[str] = Header(None)):
     task_id = str(uuid.uuid4())
+    client_id = request.user_id or (http_request.client.host if http_request.client else None)
     
     try:
-        await queue_manager.add_task(task_id, request)
+        with tracer.span(x_trace_id, "api.enqueue", task_id=task_id):
+            await queue_manager.add_task(task_id, request, client_id, x_trace_id)
         
         return GenerationResponse(
             task_id=task_id,
             status="queued",
             message="Task added to queue successfully"
         )
+    except AdmissionRejected as e:
+        tasks_rejected_total.inc()
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server is busy: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add task to queue: {str(e)}")
 
+@router.delete("/generator/{task_id}", response_model=GenerationResponse)
+async def cancel_generation(task_id: str):
+    status = await queue_manager.cancel_task(task_id)
+    
+    if status is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if status["status"] != "cancelled":
+        raise HTTPException(status_code=409, detail=f"Task already {status['status']}")
+    
+    return GenerationResponse(
+        task_id=task_id,
+        status="cancelled",
+        message="Task cancelled successfully"
+    )
+
+@router.websocket("/ws")
+async def status_stream_endpoint(websocket: WebSocket):
+    """One socket for many tasks: clients send {"action": "subscribe" | "unsubscribe", "task_ids": [...]}
+    and receive {"task_id": ..., **status} for every change of a subscribed task"""
+    await websocket_manager.connect_stream(websocket)
+    channel: asyncio.Queue = asyncio.Queue()
+    subscriptions: Set[str] = set()
+    writer = asyncio.create_task(websocket_manager.push_stream_updates(
+        websocket, channel, subscriptions, queue_manager.unsubscribe, TERMINAL_STATUSES
+    ))
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action")
+            
+            for task_id in message.get("task_ids", []):
+                if action == "subscribe" and task_id not in subscriptions:
+                    status = await queue_manager.get_task_status(task_id)
+                    if status is None:
+                        channel.put_nowait((task_id, {"status": "error", "error_message": "Task not found"}))
+                        continue
+                    if status["status"] not in TERMINAL_STATUSES:
+                        subscriptions.add(task_id)
+                        queue_manager.subscribe(task_id, channel)
+                    channel.put_nowait((task_id, status))
+                elif action == "unsubscribe" and task_id in subscriptions:
+                    subscriptions.discard(task_id)
+                    queue_manager.unsubscribe(task_id, channel)
+                    
+    except (WebSocketDisconnect, Exception):
+        pass
+    finally:
+        writer.cancel()
+        for task_id in subscriptions:
+            queue_manager.unsubscribe(task_id, channel)
+        websocket_manager.disconnect_stream(websocket)
+
 @router.websocket("/ws/{task_id}")
 async def websocket_endpoint(websocket: WebSocket, task_id: str):
     await websocket_manager.connect(websocket, task_id)
+    channel = queue_manager.subscribe(task_id)
     try:
-        last_status = None
-        consecutive_errors = 0
+        status = await queue_manager.get_task_status(task_id)
         
-        while True:
-            try:
-                await asyncio.sleep(0.5)
-                status = await queue_manager.get_task_status(task_id)
-                
-                if status:
-                    should_send = (status != last_status or 
-                                 (status.get("status") == "processing" and 
-                                  status.get("progress") != (last_status.get("progress") if last_status else None)))
-                    
-                    if should_send:
-                        await websocket_manager.send_status_update(task_id, status)
-                        last_status = status
-                        consecutive_errors = 0
-                    
-                    if status["status"] in ["completed", "error"]:
-                        await asyncio.sleep(0.5)
-                        try:
-                            await websocket.close(code=1000, reason="Task completed")
-                        except:
-                            pass
-                        break
-                else:
-                    consecutive_errors += 1
-                    if consecutive_errors > 5:
-                        await websocket_manager.send_status_update(task_id, {
-                            "status": "error",
-                            "error_message": "Task not found"
-                        })
-                        break
-                        
-            except asyncio.CancelledError:
-                break
-            except Exception:
-                consecutive_errors += 1
-                if consecutive_errors > 10:
-                    break
+        if status is None:
+            await websocket_manager.send_to_websocket(task_id, websocket, {
+                "status": "error",
+                "error_message": "Task not found"
+            })
+            return
+        
+        await websocket_manager.push_task_updates(task_id, websocket, channel, status, TERMINAL_STATUSES)
+        
+        try:
+            await websocket.close(code=1000, reason="Task completed")
+        except:
+            pass
                     
     except (WebSocketDisconnect, Exception):
         pass
     finally:
+        queue_manager.unsubscribe(task_id, channel)
         websocket_manager.disconnect(task_id, websocket)
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @router.get("/image/{filename}")
 async def get_image(filename: str):
     import os
@@ -85,4 +190,4 @@ async def get_image(filename: str):
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Image not found")
     
-    return FileResponse(file_path, media_type="image/png")
\ No newline at end of file
+    return FileResponse(file_path, media_type=get_media_type(filename))
\ No newline at end of file
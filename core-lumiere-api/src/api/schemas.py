@@ -1,11 +1,21 @@
 from pydantic import BaseModel, Field
-from ..utils.constants import get_quality_steps, get_aspect_ratios
+from typing import Dict, Optional
+import os
+from ..utils.constants import (
+    get_quality_steps, get_aspect_ratios, get_max_request_loras, get_output_formats, get_priority_classes
+)
 
 class GenerationRequest(BaseModel):
     prompt: str = Field(..., description="User's positive prompt for image generation")
     quality: str = Field(..., description="Image generation quality")
     aspect_ratio: str = Field(..., description="Image aspect ratio")
-    embedding_model: str = Field(None, description="Optional SDXL embedding model name")
+    embedding_model: Optional[str] = Field(None, description="Optional SDXL embedding model name")
+    loras: Optional[Dict[str, float]] = Field(None, description="Optional LoRA files mapped to their adapter weights")
+    output_format: Optional[str] = Field(None, description="Optional output format name from the server config")
+    seed: Optional[int] = Field(None, ge=0, lt=2 ** 32, description="Optional seed for reproducible generation")
+    user_id: Optional[str] = Field(None, description="Requesting user identifier, used for fair scheduling")
+    guild_id: Optional[str] = Field(None, description="Requesting guild identifier, used for fair scheduling")
+    priority: Optional[str] = Field(None, description="Optional priority class name from the server config")
     
     def __init__(self, **data):
         super().__init__(**data)
@@ -16,6 +26,17 @@ class GenerationRequest(BaseModel):
             raise ValueError(f"Quality must be one of: {quality_options}")
         if self.aspect_ratio not in aspect_options:
             raise ValueError(f"Aspect ratio must be one of: {aspect_options}")
+        if self.priority is not None and self.priority not in get_priority_classes():
+            raise ValueError(f"Priority must be one of: {list(get_priority_classes().keys())}")
+        if self.output_format is not None and self.output_format not in get_output_formats():
+            raise ValueError(f"Output format must be one of: {list(get_output_formats().keys())}")
+        if self.loras:
+            max_loras = get_max_request_loras()
+            if len(self.loras) > max_loras:
+                raise ValueError(f"At most {max_loras} LoRAs can be requested")
+            for lora_file in self.loras:
+                if not lora_file or os.path.basename(lora_file) != lora_file:
+                    raise ValueError(f"Invalid LoRA name: {lora_file}")
 
 class GenerationResponse(BaseModel):
     task_id: str = Field(..., description="Unique task identifier")
@@ -27,4 +48,10 @@ class StatusUpdate(BaseModel):
     queue_position: int = Field(None, description="Position in queue (if queued)")
     progress: str = Field(None, description="Progress percentage (if processing)")
     image_url: str = Field(None, description="Generated image URL (if completed)")
+    preview_url: str = Field(None, description="Latest low-resolution preview URL (if processing)")
+    step: int = Field(None, description="Completed denoising steps (if processing)")
+    total_steps: int = Field(None, description="Total denoising steps (if processing)")
+    steps_per_second: float = Field(None, description="Measured denoising speed (if processing)")
+    eta_start: float = Field(None, description="Estimated start time as a unix timestamp (if queued)")
+    eta_completion: float = Field(None, description="Estimated completion time as a unix timestamp (if queued or processing)")
     error_message: str = Field(None, description="Error details (if error)")
\ No newline at end of file
@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import torch
+
+class ConditioningCache:
+    """Bounded LRU cache of Compel (conditioning, pooled) tensors"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[torch.Tensor, torch.Tensor, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _tensor_bytes(tensor: Optional[torch.Tensor]) -> int:
+        if tensor is None:
+            return 0
+        return tensor.element_size() * tensor.nelement()
+
+    def get(self, key: Hashable) -> Optional[Tuple[torch.Tensor, torch.Tensor]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key: Hashable, conditioning: torch.Tensor, pooled: torch.Tensor):
+        size = self._tensor_bytes(conditioning) + self._tensor_bytes(pooled)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[2]
+
+            self._entries[key] = (conditioning, pooled, size)
+            self.total_bytes += size
+
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted[2]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
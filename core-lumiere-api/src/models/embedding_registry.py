@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from typing import Collection, Set
+
+from ..utils.file_checksum import file_checksums
+
+class EmbeddingRegistry:
+    """Tracks textual inversions loaded into a pipeline, keyed by token and file checksum"""
+
+    def __init__(self, max_loaded: int = 0):
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, str]" = OrderedDict()
+        self._pinned: Set[str] = set()
+
+    def ensure_loaded(self, pipeline, token: str, path: str, pinned: bool = False,
+                      keep: Collection[str] = ()) -> bool:
+        """Load the embedding once; returns True when the loaded set changed
+
+        Tokens in keep (the other embeddings the current call needs) are never
+        evicted to make room, even if that leaves more than max_loaded loaded.
+        """
+        checksum = file_checksums.checksum(path)
+        if pinned:
+            self._pinned.add(token)
+
+        if self._loaded.get(token) == checksum:
+            self._loaded.move_to_end(token)
+            return False
+
+        if token in self._loaded:
+            self._unload(pipeline, token)
+
+        pipeline.load_textual_inversion(path, token=token)
+        self._loaded[token] = checksum
+        print(f"Successfully loaded embedding: {token}")
+
+        self._evict(pipeline, keep={token, *keep})
+        return True
+
+    def _evict(self, pipeline, keep: Collection[str] = ()):
+        if self.max_loaded <= 0:
+            return
+
+        for token in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded:
+                break
+            if token in self._pinned or token in keep:
+                continue
+            self._unload(pipeline, token)
+
+    def _unload(self, pipeline, token: str):
+        if not hasattr(pipeline, "unload_textual_inversion"):
+            print(f"Warning: Pipeline cannot unload textual inversions, keeping {token}")
+            return
+        pipeline.unload_textual_inversion(tokens=[token])
+        del self._loaded[token]
+        print(f"Unloaded embedding: {token}")
+
+    def fingerprint(self) -> tuple:
+        return tuple(sorted(self._loaded.items()))
+
+    def clear(self):
+        self._loaded.clear()
+        self._pinned.clear()
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._loaded
+
+    def __len__(self) -> int:
+        return len(self._loaded)
@@ -3,21 +3,64 @@ from diffusers import StableDiffusionXLPipeline, AutoencoderKL, EulerAncestralDi
 from compel import Compel, ReturnedEmbeddingsType
 import asyncio
 import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Callable
+from typing import Optional, Callable, Collection, Dict, List
+from PIL import Image
 
 from ..utils.constants import (
     get_model_path, get_vae_file, get_positive_prompt, get_negative_prompt, 
-    get_apply_lora, get_apply_embeddings, get_quality_steps, get_aspect_ratios, get_guidance_scale
+    get_apply_lora, get_apply_embeddings, get_quality_steps, get_aspect_ratios, get_guidance_scale,
+    get_conditioning_cache_max_entries, get_conditioning_cache_max_megabytes, get_max_loaded_embeddings,
+    get_lora_fuse_threshold, get_preview_every_n_steps
 )
 from ..utils.logger import get_output_dir
+from ..utils.image_encoder import image_encoder
+from .conditioning_cache import ConditioningCache
+from .embedding_registry import EmbeddingRegistry
+from .lora_manager import LoraManager, LoraSet, lora_set_key
+from .latent_preview import LatentPreviewer
+
+SCHEDULER_NAME = EulerAncestralDiscreteScheduler.__name__
+
+class GenerationCancelled(Exception):
+    pass
 
 class ImageGenerator:
-    def __init__(self):
+    def __init__(self, device: Optional[str] = None, name: str = "generator"):
         self.pipeline: Optional[StableDiffusionXLPipeline] = None
         self.compel: Optional[Compel] = None
-        self.device = self._get_device()
+        self.device = device or self._get_device()
+        self.name = name
+        self.cpu_threads = 0
+        self.cpu_cores: Optional[List[int]] = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=name, initializer=self._init_executor_thread
+        )
         self.is_loaded = False
+        api_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.lora_manager = LoraManager(
+            lora_dir=os.path.join(api_dir, "models", "lora"),
+            fuse_threshold=get_lora_fuse_threshold()
+        )
+        self.active_lora_key: LoraSet = ()
+        self.embedding_registry = EmbeddingRegistry(max_loaded=get_max_loaded_embeddings())
+        self.conditioning_cache = ConditioningCache(
+            max_entries=get_conditioning_cache_max_entries(),
+            max_bytes=get_conditioning_cache_max_megabytes() * 1024 * 1024
+        )
+        self._negative_conditioning = None
+        self.previewer = LatentPreviewer()
+    
+    def _init_executor_thread(self):
+        """Limit torch's intra-op threads, and optionally pin them, so CPU replicas don't oversubscribe cores"""
+        if self.cpu_cores and hasattr(os, "sched_setaffinity"):
+            # On Linux pid 0 is the calling thread; threads torch spawns from here inherit the mask
+            os.sched_setaffinity(0, self.cpu_cores)
+        if self.cpu_threads > 0:
+            torch.set_num_threads(self.cpu_threads)
     
     def _get_device(self):
         if torch.cuda.is_available():
@@ -35,23 +78,23 @@ class ImageGenerator:
         
         vae = AutoencoderKL.from_pretrained(
             vae_path,
-            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+            torch_dtype=torch.float16 if self.device.startswith("cuda") else torch.float32,
             local_files_only=True
         )
         
         self.pipeline = StableDiffusionXLPipeline.from_pretrained(
             model_path,
             vae=vae,
-            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+            torch_dtype=torch.float16 if self.device.startswith("cuda") else torch.float32,
             use_safetensors=True,
             local_files_only=True
         )
         
         self.pipeline.scheduler = EulerAncestralDiscreteScheduler.from_config(self.pipeline.scheduler.config)
         
-        if self.device == "cuda":
-            self.pipeline = self.pipeline.to("cuda")
-            self.pipeline.enable_model_cpu_offload()
+        if self.device.startswith("cuda"):
+            self.pipeline = self.pipeline.to(self.device)
+            self.pipeline.enable_model_cpu_offload(device=self.device)
 
             try:
                 self.pipeline.enable_xformers_memory_efficient_attention()
@@ -59,40 +102,40 @@ class ImageGenerator:
             except Exception as e:
                 print(f"Warning: Failed to enable xformers: {e}")
 
-        self.compel = Compel(
-            tokenizer=[self.pipeline.tokenizer, self.pipeline.tokenizer_2],
-            text_encoder=[self.pipeline.text_encoder, self.pipeline.text_encoder_2],
-            returned_embeddings_type=ReturnedEmbeddingsType.PENULTIMATE_HIDDEN_STATES_NON_NORMALIZED,
-            requires_pooled=[False, True],
-            device=self.device,
-        )
+        self.compel = self._create_compel()
         print("Compel initialized for enhanced prompt processing")
 
-        for lora_file in get_apply_lora():
-            lora_path = os.path.join(api_dir, "models", "lora", lora_file)
-            if os.path.exists(lora_path):
-                try:
-                    self.pipeline.load_lora_weights(lora_path)
-                    print(f"Successfully loaded LoRA: {lora_file}")
-                except Exception as e:
-                    print(f"Warning: Failed to load LoRA {lora_file}: {e}")
-            else:
-                print(f"Warning: LoRA file not found: {lora_path}")
+        self.lora_manager.load_defaults(self.pipeline, get_apply_lora())
         
         for embedding_file in get_apply_embeddings():
-            await self._apply_embedding_model(embedding_file)
+            await self._apply_embedding_model(embedding_file, pinned=True)
+        
+        negative_conditioning, _ = self._get_negative_conditioning(get_negative_prompt())
+        if negative_conditioning is not None:
+            print("Negative prompt conditioning precomputed")
         
         self.is_loaded = True
     
-    async def _apply_embedding_model(self, embedding_model: str):
-        """Apply embedding model to the pipeline"""
+    def _create_compel(self) -> Compel:
+        return Compel(
+            tokenizer=[self.pipeline.tokenizer, self.pipeline.tokenizer_2],
+            text_encoder=[self.pipeline.text_encoder, self.pipeline.text_encoder_2],
+            returned_embeddings_type=ReturnedEmbeddingsType.PENULTIMATE_HIDDEN_STATES_NON_NORMALIZED,
+            requires_pooled=[False, True],
+            device=self.device,
+        )
+    
+    async def _apply_embedding_model(self, embedding_model: str, pinned: bool = False, keep: Collection[str] = ()):
+        """Apply embedding model to the pipeline unless the same file is already loaded"""
         api_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         embedding_path = os.path.join(api_dir, "models", "embedding", f"{embedding_model}.pt")
         
         if os.path.exists(embedding_path):
             try:
-                self.pipeline.load_textual_inversion(embedding_path, token=embedding_model)
-                print(f"Successfully loaded embedding: {embedding_model}")
+                if self.embedding_registry.ensure_loaded(
+                    self.pipeline, embedding_model, embedding_path, pinned=pinned, keep=keep
+                ):
+                    self._invalidate_conditioning()
             except Exception as e:
                 print(f"Warning: Failed to load embedding model {embedding_model}: {e}")
         else:
@@ -116,78 +159,214 @@ class ImageGenerator:
             print(f"Warning: Compel negative prompt processing failed, using fallback: {e}")
             return None, None
     
+    def _conditioning_fingerprint(self) -> tuple:
+        """Identify everything besides the prompt text that changes Compel output"""
+        dtype = self.pipeline.text_encoder_2.dtype if self.pipeline is not None else None
+        return (self.lora_manager.active, self.embedding_registry.fingerprint(), str(dtype), self.device)
+    
+    def _invalidate_conditioning(self):
+        """Drop cached conditioning after the tokenizer vocabulary or text encoders changed"""
+        self.conditioning_cache.clear()
+        self._negative_conditioning = None
+    
+    def _get_conditioning(self, prompt: str) -> tuple:
+        """Return Compel conditioning for a prompt, reusing cached tensors when possible"""
+        key = (prompt, self._conditioning_fingerprint())
+        cached = self.conditioning_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        conditioning, pooled = self._process_prompt_with_compel(prompt)
+        if conditioning is not None:
+            self.conditioning_cache.put(key, conditioning, pooled)
+        return conditioning, pooled
+    
+    def _get_negative_conditioning(self, negative_prompt: str) -> tuple:
+        """Return the negative conditioning, recomputing only when the prompt or loaded set changed"""
+        key = (negative_prompt, self._conditioning_fingerprint())
+        if self._negative_conditioning is not None and self._negative_conditioning[0] == key:
+            return self._negative_conditioning[1], self._negative_conditioning[2]
+        
+        negative_conditioning, negative_pooled = self._process_negative_prompt_with_compel(negative_prompt)
+        if negative_conditioning is not None:
+            self._negative_conditioning = (key, negative_conditioning, negative_pooled)
+        return negative_conditioning, negative_pooled
+    
     async def generate_image(
         self, 
         prompt: str, 
         quality: str, 
         aspect_ratio: str,
         embedding_model: Optional[str] = None,
+        loras: Optional[Dict[str, float]] = None,
+        output_format: Optional[str] = None,
+        seed: Optional[int] = None,
         progress_callback: Optional[Callable[[int, int], None]] = None,
         use_compel: bool = True
     ) -> str:
+        filenames = await self.generate_images(
+            prompts=[prompt],
+            quality=quality,
+            aspect_ratio=aspect_ratio,
+            embedding_models=[embedding_model],
+            loras=loras,
+            output_formats=[output_format],
+            seeds=[seed],
+            progress_callback=progress_callback,
+            use_compel=use_compel
+        )
+        return filenames[0]
+    
+    def _build_batch_conditioning(self, full_prompts: List[str], negative_prompt: str) -> Optional[dict]:
+        """Stack per-item Compel embeddings into batched pipeline inputs"""
+        conditionings = []
+        pooled_list = []
+        for full_prompt in full_prompts:
+            conditioning, pooled = self._get_conditioning(full_prompt)
+            if conditioning is None:
+                return None
+            conditionings.append(conditioning)
+            pooled_list.append(pooled)
+        
+        negative_conditioning, negative_pooled = self._get_negative_conditioning(negative_prompt)
+        if negative_conditioning is None:
+            return None
+        
+        padded = self.compel.pad_conditioning_tensors_to_same_length(conditionings + [negative_conditioning])
+        batch_size = len(full_prompts)
+        
+        return {
+            "prompt_embeds": torch.cat(padded[:-1]),
+            "pooled_prompt_embeds": torch.cat(pooled_list),
+            "negative_prompt_embeds": padded[-1].repeat(batch_size, 1, 1),
+            "negative_pooled_prompt_embeds": negative_pooled.repeat(batch_size, 1)
+        }
+    
+    async def generate_images(
+        self,
+        prompts: List[str],
+        quality: str,
+        aspect_ratio: str,
+        embedding_models: Optional[List[Optional[str]]] = None,
+        loras: Optional[Dict[str, float]] = None,
+        output_formats: Optional[List[Optional[str]]] = None,
+        seeds: Optional[List[Optional[int]]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        preview_callback: Optional[Callable[[int, int, Image.Image], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        stage_callback: Optional[Callable[[str, float, float], None]] = None,
+        use_compel: bool = True
+    ) -> List[str]:
+        """Generate one image per prompt in a single batched pipeline call sharing one LoRA set
+
+        stage_callback, if given, receives (stage, unix start time, seconds) for
+        text_encoding, denoise, vae_decode and save.
+        """
+        def report_stage(stage: str, start: float, end: float):
+            if stage_callback:
+                stage_callback(stage, start, end - start)
+        
         if not self.is_loaded:
             await self.load_model()
         
-        if embedding_model:
-            await self._apply_embedding_model(embedding_model)
+        requested_embeddings = [
+            embedding_model for embedding_model in dict.fromkeys(embedding_models or []) if embedding_model
+        ]
+        for embedding_model in requested_embeddings:
+            await self._apply_embedding_model(embedding_model, keep=requested_embeddings)
         
-        full_prompt = prompt + get_positive_prompt()
+        full_prompts = [prompt + get_positive_prompt() for prompt in prompts]
         negative_prompt = get_negative_prompt()
         
         steps = get_quality_steps()[quality]
         width, height = get_aspect_ratios()[aspect_ratio]
         
+        seeds = [seed if seed is not None else random.randrange(2 ** 32) for seed in (seeds or [None] * len(prompts))]
+        generators = [torch.Generator(device="cpu").manual_seed(seed) for seed in seeds]
+        
+        preview_every = get_preview_every_n_steps() if preview_callback else 0
+        
+        last_step_at = None
+        
         def callback_wrapper(pipe, step: int, timestep: int, callback_kwargs):
+            nonlocal last_step_at
+            last_step_at = time.time()
+            if should_cancel and should_cancel():
+                raise GenerationCancelled(f"Cancelled after step {step + 1}/{steps}")
             if progress_callback:
                 progress_callback(step, steps)
+            if preview_every > 0 and (step + 1) % preview_every == 0 and step + 1 < steps:
+                try:
+                    for index, preview in enumerate(self.previewer.decode(callback_kwargs["latents"])):
+                        preview_callback(index, step, preview)
+                except Exception as e:
+                    print(f"Warning: Failed to build latent preview: {e}")
             return callback_kwargs
         
         def run_pipeline():
+            if should_cancel and should_cancel():
+                raise GenerationCancelled("Cancelled before start")
+            self.lora_manager.activate(self.pipeline, self.lora_manager.resolve(loras))
+            self.active_lora_key = lora_set_key(loras)
+            
             pipeline_kwargs = {
                 "num_inference_steps": steps,
                 "width": width,
                 "height": height,
                 "guidance_scale": get_guidance_scale(),
+                "generator": generators,
                 "callback_on_step_end": callback_wrapper,
                 "callback_on_step_end_tensor_inputs": ["latents"]
             }
             
             if use_compel and self.compel is not None:
-                conditioning, pooled = self._process_prompt_with_compel(full_prompt)
-                negative_conditioning, negative_pooled = self._process_negative_prompt_with_compel(negative_prompt)
+                encoding_started = time.time()
+                batch_conditioning = self._build_batch_conditioning(full_prompts, negative_prompt)
+                report_stage("text_encoding", encoding_started, time.time())
                 
-                if conditioning is not None and negative_conditioning is not None:
-                    pipeline_kwargs.update({
-                        "prompt_embeds": conditioning,
-                        "pooled_prompt_embeds": pooled,
-                        "negative_prompt_embeds": negative_conditioning,
-                        "negative_pooled_prompt_embeds": negative_pooled
-                    })
+                if batch_conditioning is not None:
+                    pipeline_kwargs.update(batch_conditioning)
                     print("Using Compel-processed embeddings for enhanced prompt weighting")
                 else:
                     pipeline_kwargs.update({
-                        "prompt": full_prompt,
-                        "negative_prompt": negative_prompt
+                        "prompt": full_prompts,
+                        "negative_prompt": [negative_prompt] * len(full_prompts)
                     })
                     print("Fallback to standard prompt processing")
             else:
                 pipeline_kwargs.update({
-                    "prompt": full_prompt,
-                    "negative_prompt": negative_prompt
+                    "prompt": full_prompts,
+                    "negative_prompt": [negative_prompt] * len(full_prompts)
                 })
                 print("Using standard prompt processing")
             
-            return self.pipeline(**pipeline_kwargs).images[0]
-        
-        image = await asyncio.get_event_loop().run_in_executor(None, run_pipeline)
+            denoise_started = time.time()
+            images = self.pipeline(**pipeline_kwargs).images
+            finished = time.time()
+            # The pipeline decodes latents right after the last step callback returns
+            denoise_finished = last_step_at or finished
+            report_stage("denoise", denoise_started, denoise_finished)
+            report_stage("vae_decode", denoise_finished, finished)
+            return images
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-        filename = f"{timestamp}.png"
-        output_path = os.path.join(get_output_dir(), filename)
+        images = await asyncio.get_event_loop().run_in_executor(self.executor, run_pipeline)
         
-        image.save(output_path)
+        save_started = time.time()
+        # Replicas share the output directory, so the generator name keeps same-millisecond results apart
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3] + f"_{self.name}"
+        output_formats = output_formats or [None] * len(images)
+        saved = await asyncio.gather(*(
+            image_encoder.save(
+                image,
+                get_output_dir(),
+                timestamp if len(images) == 1 else f"{timestamp}_{index}",
+                output_format
+            )
+            for index, (image, output_format) in enumerate(zip(images, output_formats))
+        ))
+        report_stage("save", save_started, time.time())
         
-        return filename
+        return [filename for filename, _ in saved]
 
     def unload_model(self):
         """Unload model and free memory"""
@@ -199,6 +378,11 @@ class ImageGenerator:
             del self.compel
             self.compel = None
         
+        self._invalidate_conditioning()
+        self.lora_manager.clear()
+        self.active_lora_key = ()
+        self.embedding_registry.clear()
+        
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         
@@ -0,0 +1,28 @@
+import numpy as np
+import torch
+from PIL import Image
+from typing import List
+
+SDXL_LATENT_RGB_FACTORS = [
+    [0.3651, 0.4232, 0.4341],
+    [-0.2533, -0.0042, 0.1068],
+    [0.1076, 0.1111, -0.0362],
+    [-0.3165, -0.2492, -0.2188]
+]
+
+SDXL_LATENT_RGB_BIAS = [0.1084, -0.0175, -0.0011]
+
+class LatentPreviewer:
+    """Approximates RGB from SDXL latents with a linear projection instead of a VAE decode"""
+
+    def __init__(self):
+        self._factors = torch.tensor(SDXL_LATENT_RGB_FACTORS)
+        self._bias = torch.tensor(SDXL_LATENT_RGB_BIAS)
+
+    @torch.no_grad()
+    def decode(self, latents: torch.Tensor) -> List[Image.Image]:
+        """Return one latent-resolution (1/8 scale) preview per batch item"""
+        latents = latents.detach().to(device="cpu", dtype=torch.float32)
+        rgb = torch.einsum("bchw,cr->bhwr", latents, self._factors) + self._bias
+        rgb = ((rgb + 1) / 2).clamp(0, 1).mul(255).to(torch.uint8).numpy()
+        return [Image.fromarray(np.ascontiguousarray(item)) for item in rgb]
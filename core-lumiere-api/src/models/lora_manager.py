@@ -0,0 +1,99 @@
+import os
+import re
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+LoraSet = Tuple[Tuple[str, float], ...]
+
+def lora_set_key(requested: Optional[Dict[str, float]]) -> LoraSet:
+    """Hashable, order-independent form of a per-request LoRA selection"""
+    return tuple(sorted((name, float(weight)) for name, weight in (requested or {}).items()))
+
+class LoraManager:
+    """Keeps LoRA adapters loaded on a pipeline and switches the active set per task
+
+    Combinations used at least `fuse_threshold` times are fused into the base
+    weights while active, so the hottest style costs no extra per-step compute.
+    """
+
+    def __init__(self, lora_dir: str, fuse_threshold: int = 0):
+        self.lora_dir = lora_dir
+        self.fuse_threshold = fuse_threshold
+        self.adapters: Dict[str, str] = {}
+        self.defaults: Dict[str, float] = {}
+        self.active: LoraSet = ()
+        self.fused: Optional[LoraSet] = None
+        self.usage: Counter = Counter()
+
+    @staticmethod
+    def adapter_name(lora_file: str) -> str:
+        return re.sub(r"[^0-9A-Za-z_]", "_", os.path.splitext(lora_file)[0])
+
+    def ensure_loaded(self, pipeline, lora_file: str) -> str:
+        if lora_file in self.adapters:
+            return self.adapters[lora_file]
+
+        lora_path = os.path.join(self.lora_dir, lora_file)
+        if not os.path.exists(lora_path):
+            raise FileNotFoundError(f"LoRA file not found: {lora_file}")
+
+        adapter_name = self.adapter_name(lora_file)
+        pipeline.load_lora_weights(lora_path, adapter_name=adapter_name)
+        self.adapters[lora_file] = adapter_name
+        print(f"Successfully loaded LoRA: {lora_file}")
+        return adapter_name
+
+    def load_defaults(self, pipeline, lora_files):
+        """Load config LoRAs, which stay active at weight 1.0 unless a request overrides them"""
+        for lora_file in lora_files:
+            try:
+                self.ensure_loaded(pipeline, lora_file)
+                self.defaults[lora_file] = 1.0
+            except Exception as e:
+                print(f"Warning: Failed to load LoRA {lora_file}: {e}")
+        self.activate(pipeline, self.resolve(None))
+
+    def resolve(self, requested: Optional[Dict[str, float]]) -> LoraSet:
+        loras = dict(self.defaults)
+        loras.update(requested or {})
+        return tuple(sorted((name, float(weight)) for name, weight in loras.items() if weight != 0))
+
+    def activate(self, pipeline, lora_set: LoraSet) -> bool:
+        """Make lora_set the active adapters; returns True when the active set changed"""
+        self.usage[lora_set] += 1
+
+        if lora_set == self.active:
+            self._maybe_fuse(pipeline)
+            return False
+
+        if self.fused is not None:
+            pipeline.unfuse_lora()
+            self.fused = None
+
+        adapter_names = [self.ensure_loaded(pipeline, lora_file) for lora_file, _ in lora_set]
+
+        if adapter_names:
+            pipeline.enable_lora()
+            pipeline.set_adapters(adapter_names, adapter_weights=[weight for _, weight in lora_set])
+        elif self.adapters:
+            pipeline.disable_lora()
+
+        self.active = lora_set
+        self._maybe_fuse(pipeline)
+        return True
+
+    def _maybe_fuse(self, pipeline):
+        if (self.fuse_threshold <= 0 or not self.active or self.fused == self.active
+                or self.usage[self.active] < self.fuse_threshold):
+            return
+
+        pipeline.fuse_lora()
+        self.fused = self.active
+        print(f"Fused LoRA set into base weights: {', '.join(name for name, _ in self.active)}")
+
+    def clear(self):
+        self.adapters.clear()
+        self.defaults.clear()
+        self.active = ()
+        self.fused = None
+        self.usage.clear()
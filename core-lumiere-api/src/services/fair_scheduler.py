@@ -0,0 +1,73 @@
+from typing import Dict, Tuple
+
+from ..api.schemas import GenerationRequest
+from ..utils.constants import (
+    get_quality_steps, get_aspect_ratios, get_scheduling_policy, get_scheduling_tenant,
+    get_priority_classes, get_default_priority_class
+)
+
+class FairScheduler:
+    """Self-clocked weighted fair queuing across tenants
+
+    Each task gets a virtual finish tag of max(V, tenant's last tag) + cost / weight,
+    where cost is the estimated work (steps x megapixels) and V is the tag of the
+    most recently started task. Queue order is by tag, so a tenant that floods the
+    queue only delays its own later tasks.
+    """
+
+    PRUNE_INTERVAL = 256
+
+    def __init__(self):
+        self.virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._tags: Dict[str, float] = {}
+        self._dequeued = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return get_scheduling_policy() == "fair"
+
+    @staticmethod
+    def tenant_of(request: GenerationRequest) -> str:
+        if get_scheduling_tenant() == "guild":
+            return request.guild_id or request.user_id or "anonymous"
+        return request.user_id or request.guild_id or "anonymous"
+
+    @staticmethod
+    def estimate_cost(request: GenerationRequest) -> float:
+        width, height = get_aspect_ratios()[request.aspect_ratio]
+        return get_quality_steps()[request.quality] * width * height / (1024 * 1024)
+
+    def assign(self, task_id: str, request: GenerationRequest) -> Tuple:
+        """Return the TaskQueue priority for a new task"""
+        if not self.enabled():
+            return ()
+
+        tenant = self.tenant_of(request)
+        weight = get_priority_classes()[request.priority or get_default_priority_class()]
+        start = max(self.virtual_time, self._last_finish.get(tenant, 0.0))
+        tag = start + self.estimate_cost(request) / weight
+
+        self._last_finish[tenant] = tag
+        self._tags[task_id] = tag
+        return (tag,)
+
+    def on_dequeue(self, task_id: str):
+        tag = self._tags.pop(task_id, None)
+        if tag is None:
+            return
+
+        self.virtual_time = max(self.virtual_time, tag)
+        self._dequeued += 1
+        if self._dequeued % self.PRUNE_INTERVAL == 0:
+            self._last_finish = {
+                tenant: finish for tenant, finish in self._last_finish.items() if finish > self.virtual_time
+            }
+
+    def on_remove(self, task_id: str):
+        self._tags.pop(task_id, None)
+
+    def transfer(self, task_id: str, new_task_id: str):
+        tag = self._tags.pop(task_id, None)
+        if tag is not None:
+            self._tags[new_task_id] = tag
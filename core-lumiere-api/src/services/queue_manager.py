@@ -1,56 +1,456 @@
 import asyncio
-from typing import Dict, Optional
+import heapq
+import math
+import os
+import time
 from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
 
 from ..api.schemas import GenerationRequest
-from ..models.image_generator import ImageGenerator
+from ..models.image_generator import ImageGenerator, GenerationCancelled
+from ..models.lora_manager import lora_set_key
+from .task_queue import TaskQueue
+from .task_store import TaskInfo, TaskStore
+from .task_journal import TaskJournal
+from .result_cache import ResultCache, generation_key
+from .fair_scheduler import FairScheduler
+from .throughput import ThroughputEstimator, StepLatencyEstimator
+from ..utils.constants import (
+    get_positive_prompt, get_negative_prompt, get_apply_lora, get_apply_embeddings,
+    get_quality_steps, get_aspect_ratios, get_guidance_scale, get_model_devices, get_worker_count,
+    get_cpu_threads_per_worker, get_pin_cpu_workers,
+    get_batching_enabled, get_batching_max_batch_size, get_batching_window_ms,
+    get_task_ttl_seconds, get_task_store_max_entries,
+    get_journal_enabled, get_journal_path, get_journal_flush_interval_ms, get_journal_prune_interval_seconds,
+    get_adapter_grouping_lookahead, get_adapter_grouping_max_delay_seconds,
+    get_result_cache_enabled, get_result_cache_path, get_result_cache_max_megabytes, get_result_cache_unseeded,
+    get_previews_enabled, get_preview_format,
+    get_admission_max_queue_depth, get_admission_max_pending_seconds, get_admission_max_tasks_per_client,
+    get_initial_seconds_per_megapixel_step
+)
 from ..utils.logger import get_logger, get_output_dir
+from ..utils.image_encoder import image_encoder
+from ..utils.tracing import tracer
+from ..utils.metrics import queue_wait_seconds, generation_seconds, steps_per_second, tasks_total, model_load_seconds
 
 logger = get_logger(__name__)
 
-class TaskInfo:
-    def __init__(self, task_id: str, request: GenerationRequest):
-        self.task_id = task_id
-        self.request = request
-        self.status = "queued"
-        self.progress = "0%"
-        self.image_url = None
-        self.error_message = None
-        self.created_at = datetime.now()
+TERMINAL_STATUSES = ("completed", "error", "cancelled")
+ETA_REFRESH_SECONDS = 1.0
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
 
 class QueueManager:
     def __init__(self):
-        self.task_queue: Optional[asyncio.Queue] = None
-        self.tasks: Dict[str, TaskInfo] = {}
-        self.current_task: Optional[str] = None
-        self.image_generator = ImageGenerator()
-        self.worker_task: Optional[asyncio.Task] = None
+        self.task_queue: Optional[TaskQueue] = None
+        self.tasks = TaskStore(
+            ttl_seconds=get_task_ttl_seconds(),
+            max_entries=get_task_store_max_entries()
+        )
+        self.in_flight_tasks: Set[str] = set()
+        self.image_generators: List[ImageGenerator] = self._create_generators()
+        self.worker_tasks: List[asyncio.Task] = []
+        self._task_added: Optional[asyncio.Event] = None
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.journal: Optional[TaskJournal] = None
+        if get_journal_enabled():
+            self.journal = TaskJournal(
+                get_journal_path(), get_journal_flush_interval_ms(), get_journal_prune_interval_seconds()
+            )
+        self.result_cache: Optional[ResultCache] = None
+        if get_result_cache_enabled():
+            self.result_cache = ResultCache(get_result_cache_path(), get_result_cache_max_megabytes() * 1024 * 1024)
+        self.scheduler = FairScheduler()
+        self.throughput = ThroughputEstimator(get_initial_seconds_per_megapixel_step())
+        self.step_latency = StepLatencyEstimator(self.throughput)
+        self.pending_work = 0.0
+        self._client_active: Dict[str, int] = {}
+        self._running_batches: Dict[str, List[TaskInfo]] = {}
+        self._collecting_batches: Dict[str, List[str]] = {}
+        self._eta_schedule: Optional[Dict[str, Tuple[float, float]]] = None
+        self._eta_computed_at = 0.0
+        self._inflight_keys: Dict[str, str] = {}
+        self._followers: Dict[str, List[str]] = {}
+        self._leader_of: Dict[str, str] = {}
         self._initialized = False
     
     async def initialize(self):
         if not self._initialized:
-            self.task_queue = asyncio.Queue()
+            self.task_queue = TaskQueue()
+            self._task_added = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
             self._initialized = True
-            await self._start_worker()
+            if self.journal is not None:
+                await self._replay_journal()
+            await self._start_workers()
+    
+    async def shutdown(self):
+        if self.journal is not None:
+            await self.journal.close()
+    
+    async def _replay_journal(self):
+        """Restore finished tasks and re-enqueue unfinished ones in their original order"""
+        rows = await self.journal.open(retention_seconds=self.tasks.ttl_seconds)
+        requeued = 0
+        
+        for row in rows:
+            task_id = row["task_id"]
+            
+            if row["status"] in TERMINAL_STATUSES:
+                task = TaskInfo(task_id, None)
+                task.status = row["status"]
+                task.progress = "100%" if row["status"] == "completed" else task.progress
+                task.image_url = row["image_url"]
+                task.error_message = row["error_message"]
+                task.created_at = row["created_at"]
+                task.cache_key = row["cache_key"]
+                task.trace_id = row["trace_id"]
+                self.tasks.add(task)
+                self.tasks.mark_finished(task_id, finished_at=row["finished_at"])
+                continue
+            
+            try:
+                request = TaskJournal.decode_request(row["request"])
+            except Exception as e:
+                task = TaskInfo(task_id, None)
+                task.status = "error"
+                task.error_message = f"Failed to restore task: {str(e)}"
+                task.created_at = row["created_at"]
+                task.trace_id = row["trace_id"]
+                self.tasks.add(task)
+                self.tasks.mark_finished(task_id)
+                self.journal.record_status(task)
+                continue
+            
+            task = TaskInfo(task_id, request)
+            task.created_at = row["created_at"]
+            # Recomputed rather than restored, since model files may have changed across the restart
+            task.cache_key = await self._result_cache_key(request)
+            task.trace_id = row["trace_id"]
+            self.tasks.add(task)
+            if task.cache_key is not None:
+                self._inflight_keys.setdefault(task.cache_key, task_id)
+            self._track_active(task, request.user_id)
+            self.task_queue.put(task_id, self.scheduler.assign(task_id, request))
+            if row["status"] != "queued":
+                self.journal.record_status(task)
+            requeued += 1
+        
+        if requeued:
+            self._task_added.set()
+            logger.info(f"Re-enqueued {requeued} unfinished tasks from journal")
+    
+    def _create_generators(self) -> List[ImageGenerator]:
+        devices = get_model_devices()
+        generators = []
+        for index in range(max(1, get_worker_count())):
+            device = devices[index % len(devices)] if devices else None
+            generators.append(ImageGenerator(device=device, name=f"generator-{index}"))
+        self._partition_cpu(generators)
+        return generators
     
-    async def _start_worker(self):
-        if self.worker_task is None or self.worker_task.done():
-            self.worker_task = asyncio.create_task(self._worker())
-            logger.info("Queue worker task started")
+    def _partition_cpu(self, generators: List[ImageGenerator]):
+        """Split the available cores between CPU workers instead of letting each use all of them"""
+        cpu_generators = [generator for generator in generators if generator.device == "cpu"]
+        if not cpu_generators:
+            return
+        
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+        threads = get_cpu_threads_per_worker() or max(1, len(cores) // len(cpu_generators))
+        pin = get_pin_cpu_workers() and threads * len(cpu_generators) <= len(cores)
+        
+        for index, generator in enumerate(cpu_generators):
+            generator.cpu_threads = threads
+            if pin:
+                generator.cpu_cores = cores[index * threads:(index + 1) * threads]
+            logger.info(
+                f"{generator.name} uses {threads} CPU threads"
+                + (f" pinned to cores {generator.cpu_cores}" if generator.cpu_cores else "")
+            )
+    
+    async def _start_workers(self):
+        self.worker_tasks = [worker_task for worker_task in self.worker_tasks if not worker_task.done()]
+        if self.worker_tasks:
+            return
+        
+        for index, generator in enumerate(self.image_generators):
+            self.worker_tasks.append(asyncio.create_task(self._worker(index, generator)))
+            logger.info(f"Queue worker {index} started on device {generator.device}")
     
-    async def add_task(self, task_id: str, request: GenerationRequest):
+    async def add_task(self, task_id: str, request: GenerationRequest, client_id: Optional[str] = None,
+                       trace_id: Optional[str] = None):
         await self.initialize()
+        cache_key = await self._result_cache_key(request)
+        if cache_key is None or (cache_key not in self._inflight_keys and cache_key not in self.result_cache):
+            self.check_admission(request, client_id)
+        
         task_info = TaskInfo(task_id, request)
-        self.tasks[task_id] = task_info
-        await self.task_queue.put(task_id)
+        task_info.cache_key = cache_key
+        task_info.trace_id = trace_id
+        self.tasks.add(task_info)
+        if self.journal is not None:
+            self.journal.record_added(task_info)
+        
+        if task_info.cache_key is not None:
+            if await self._complete_from_cache(task_info):
+                return
+            
+            leader_id = self._inflight_keys.get(task_info.cache_key)
+            if leader_id is not None and leader_id in self.tasks:
+                self._track_active(task_info, client_id, cost=0.0)
+                self._attach_follower(task_id, leader_id)
+                return
+            self._inflight_keys[task_info.cache_key] = task_id
+        
+        self._track_active(task_info, client_id)
+        self.task_queue.put(task_id, self.scheduler.assign(task_id, request))
+        self._task_added.set()
+        self._eta_schedule = None
+        if self.task_queue.position(task_id) < len(self.task_queue) - 1:
+            self._publish_queue_positions()
+        else:
+            self._publish(task_id)
         logger.info(f"Task {task_id} added to queue")
     
+    async def cancel_task(self, task_id: str) -> Optional[Dict]:
+        """Cancel a queued or running task and return its final status, or None if it is unknown"""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        if task.status in TERMINAL_STATUSES:
+            return self._build_status(task_id)
+        
+        leader_id = self._leader_of.pop(task_id, None)
+        if leader_id is not None:
+            followers = self._followers.get(leader_id, [])
+            if task_id in followers:
+                followers.remove(task_id)
+            if not followers:
+                self._followers.pop(leader_id, None)
+        elif self._followers.get(task_id):
+            self._promote_follower(task_id)
+        elif self.task_queue is not None and self.task_queue.remove(task_id):
+            self.scheduler.on_remove(task_id)
+        else:
+            for collecting in self._collecting_batches.values():
+                if task_id in collecting:
+                    collecting.remove(task_id)
+                    self.in_flight_tasks.discard(task_id)
+                    self.scheduler.on_remove(task_id)
+        
+        # A running task stays in its batch; the pipeline stops at the next step once the whole batch is cancelled
+        task.status = "cancelled"
+        self._finish_task(task_id)
+        self._publish_queue_positions()
+        logger.info(f"Task {task_id} cancelled")
+        return self._build_status(task_id)
+    
+    def _promote_follower(self, leader_id: str):
+        """Hand a cancelled leader's queue slot or batch slot to its first follower"""
+        followers = self._followers.pop(leader_id)
+        leader = self.tasks[leader_id]
+        new_leader_id = followers.pop(0)
+        new_leader = self.tasks[new_leader_id]
+        
+        self._leader_of.pop(new_leader_id, None)
+        for follower_id in followers:
+            self._leader_of[follower_id] = new_leader_id
+        if followers:
+            self._followers[new_leader_id] = followers
+        if leader.cache_key is not None:
+            self._inflight_keys[leader.cache_key] = new_leader_id
+        new_leader.cost, leader.cost = leader.cost, 0.0
+        
+        if self.task_queue.replace(leader_id, new_leader_id):
+            self.scheduler.transfer(leader_id, new_leader_id)
+        elif leader_id in self.in_flight_tasks:
+            self.in_flight_tasks.discard(leader_id)
+            self.in_flight_tasks.add(new_leader_id)
+            for collecting in self._collecting_batches.values():
+                if leader_id in collecting:
+                    collecting[collecting.index(leader_id)] = new_leader_id
+            for running in self._running_batches.values():
+                if leader in running:
+                    running[running.index(leader)] = new_leader
+        logger.info(f"Task {new_leader_id} took over generation from cancelled task {leader_id}")
+    
+    def check_admission(self, request: GenerationRequest, client_id: Optional[str] = None):
+        """Raise AdmissionRejected with a Retry-After estimate when a configured limit is exceeded"""
+        workers = max(1, len(self.image_generators))
+        seconds_per_unit = self.throughput.seconds_per_unit
+        pending_seconds = self.pending_work * seconds_per_unit
+        queue_size = self.get_queue_size()
+        average_task_seconds = pending_seconds / queue_size if queue_size else 0
+        
+        max_queue_depth = get_admission_max_queue_depth()
+        if max_queue_depth > 0 and queue_size >= max_queue_depth:
+            raise AdmissionRejected(
+                "Queue is full",
+                average_task_seconds * (queue_size - max_queue_depth + 1) / workers
+            )
+        
+        max_pending_seconds = get_admission_max_pending_seconds()
+        if max_pending_seconds > 0 and pending_seconds > 0:
+            request_seconds = FairScheduler.estimate_cost(request) * seconds_per_unit
+            overflow = pending_seconds + request_seconds - max_pending_seconds
+            if overflow > 0:
+                raise AdmissionRejected("Too much pending work", overflow / workers)
+        
+        max_per_client = get_admission_max_tasks_per_client()
+        if max_per_client > 0 and client_id and self._client_active.get(client_id, 0) >= max_per_client:
+            raise AdmissionRejected("Too many active tasks for this client", average_task_seconds)
+    
+    def _track_active(self, task: TaskInfo, client_id: Optional[str], cost: Optional[float] = None):
+        task.cost = FairScheduler.estimate_cost(task.request) if cost is None else cost
+        self.pending_work += task.cost
+        if client_id:
+            task.client_id = client_id
+            self._client_active[client_id] = self._client_active.get(client_id, 0) + 1
+    
+    def _untrack_active(self, task: TaskInfo):
+        self.pending_work = max(0.0, self.pending_work - task.cost)
+        task.cost = 0.0
+        if task.client_id:
+            remaining = self._client_active.get(task.client_id, 0) - 1
+            if remaining > 0:
+                self._client_active[task.client_id] = remaining
+            else:
+                self._client_active.pop(task.client_id, None)
+            task.client_id = None
+    
+    async def _result_cache_key(self, request: GenerationRequest) -> Optional[str]:
+        if self.result_cache is None:
+            return None
+        if request.seed is None and not get_result_cache_unseeded():
+            return None
+        # LoRA and embedding files are hashed the first time they are seen
+        return await asyncio.get_event_loop().run_in_executor(None, generation_key, request)
+    
+    async def _complete_from_cache(self, task: TaskInfo) -> bool:
+        cached_filename = self.result_cache.lookup(task.cache_key)
+        if cached_filename is None:
+            return False
+        
+        try:
+            basename = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3] + f"_cached_{task.task_id}"
+            with tracer.span(task.trace_id, "result_cache.materialize", task_id=task.task_id):
+                filename = await self.result_cache.materialize(cached_filename, get_output_dir(), basename)
+        except Exception as e:
+            logger.warning(f"Failed to serve task {task.task_id} from result cache: {str(e)}")
+            return False
+        
+        task.status = "completed"
+        task.image_url = f"/image/{filename}"
+        task.progress = "100%"
+        self._finish_task(task.task_id)
+        logger.info(f"Task {task.task_id} completed from result cache")
+        return True
+    
+    def _attach_follower(self, task_id: str, leader_id: str):
+        """Let an identical request share the result of a task that is already queued or running"""
+        self._leader_of[task_id] = leader_id
+        self._followers.setdefault(leader_id, []).append(task_id)
+        self._sync_follower(task_id, leader_id)
+        self._publish(task_id)
+        logger.info(f"Task {task_id} attached to identical in-flight task {leader_id}")
+    
+    def _sync_follower(self, follower_id: str, leader_id: str):
+        follower = self.tasks.get(follower_id)
+        leader = self.tasks.get(leader_id)
+        if follower is None or leader is None:
+            return
+        follower.status = leader.status
+        follower.progress = leader.progress
+        follower.image_url = leader.image_url
+        follower.error_message = leader.error_message
+        follower.preview_url = leader.preview_url
+        follower.started_at = leader.started_at
+        follower.step = leader.step
+        follower.total_steps = leader.total_steps
+        follower.steps_per_second = leader.steps_per_second
+    
+    def subscribe(self, task_id: str, channel: Optional[asyncio.Queue] = None) -> asyncio.Queue:
+        """Register a channel that receives (task_id, status) whenever the task changes"""
+        if channel is None:
+            channel = asyncio.Queue()
+        self._subscribers.setdefault(task_id, []).append(channel)
+        return channel
+    
+    def unsubscribe(self, task_id: str, channel: asyncio.Queue):
+        channels = self._subscribers.get(task_id)
+        if not channels:
+            return
+        try:
+            channels.remove(channel)
+        except ValueError:
+            pass
+        if not channels:
+            del self._subscribers[task_id]
+    
+    def _publish(self, task_id: str):
+        for follower_id in self._followers.get(task_id, ()):
+            self._sync_follower(follower_id, task_id)
+            self._publish(follower_id)
+        
+        channels = self._subscribers.get(task_id)
+        if not channels:
+            return
+        
+        status = self._build_status(task_id)
+        if status is None:
+            return
+        
+        for channel in channels:
+            channel.put_nowait((task_id, status))
+    
+    def _finish_task(self, task_id: str, publish: bool = True):
+        if publish:
+            self._publish(task_id)
+        task = self.tasks.get(task_id)
+        if task is not None and task.request is not None:
+            tasks_total.inc(outcome=task.status, quality=task.request.quality, aspect_ratio=task.request.aspect_ratio)
+        # Tasks of a running batch keep their request until the worker releases the batch
+        self.tasks.mark_finished(task_id, release_request=task_id not in self.in_flight_tasks)
+        if task is not None:
+            self._untrack_active(task)
+        if self.journal is not None and task is not None:
+            self.journal.record_status(task)
+        
+        if task is not None and task.cache_key is not None and self._inflight_keys.get(task.cache_key) == task_id:
+            del self._inflight_keys[task.cache_key]
+        for follower_id in self._followers.pop(task_id, []):
+            self._leader_of.pop(follower_id, None)
+            self._finish_task(follower_id, publish=False)
+    
+    def _publish_threadsafe(self, task_id: str):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._publish, task_id)
+    
+    def _publish_queue_positions(self):
+        """Notify every subscribed waiting task after the head of the queue moved"""
+        self._eta_schedule = None
+        for task_id in list(self._subscribers):
+            task = self.tasks.get(task_id)
+            if task is not None and task.status == "queued":
+                self._publish(task_id)
+    
     async def get_task_status(self, task_id: str) -> Optional[Dict]:
+        return self._build_status(task_id)
+    
+    def _build_status(self, task_id: str) -> Optional[Dict]:
         if task_id not in self.tasks:
             return None
         
         task = self.tasks[task_id]
-        queue_position = self._get_queue_position(task_id)
+        leader_id = self._leader_of.get(task_id, task_id)
+        queue_position = self._get_queue_position(leader_id)
         
         status_data = {
             "status": task.status,
@@ -62,102 +462,371 @@ class QueueManager:
         if task.status == "queued" and queue_position is not None:
             status_data["queue_position"] = queue_position
         
+        if task.status == "processing" and task.preview_url:
+            status_data["preview_url"] = task.preview_url
+        
+        if task.status == "processing":
+            status_data["step"] = task.step
+            status_data["total_steps"] = task.total_steps
+            status_data["steps_per_second"] = task.steps_per_second
+        
+        if task.status in ("queued", "processing"):
+            eta = self._estimate_schedule().get(leader_id)
+            if eta is not None:
+                if task.status == "queued":
+                    status_data["eta_start"] = round(eta[0], 1)
+                status_data["eta_completion"] = round(eta[1], 1)
+        
         return status_data
     
+    def _eta_signature(self, request: GenerationRequest, batch_size: int) -> Tuple:
+        width, height = get_aspect_ratios()[request.aspect_ratio]
+        return (width, height, get_quality_steps()[request.quality], batch_size)
+    
+    def _estimate_schedule(self) -> Dict[str, Tuple[float, float]]:
+        """Project (start, completion) unix times per task by replaying the queue onto the workers"""
+        if self._eta_schedule is not None and time.monotonic() - self._eta_computed_at < ETA_REFRESH_SECONDS:
+            return self._eta_schedule
+        if self.task_queue is None:
+            return {}
+        
+        now = time.time()
+        schedule: Dict[str, Tuple[float, float]] = {}
+        free_at = []
+        for generator in self.image_generators:
+            batch = self._running_batches.get(generator.name)
+            if not batch:
+                free_at.append(now)
+                continue
+            signature = self._eta_signature(batch[0].request, len(batch))
+            completion = now + self.step_latency.remaining_seconds(signature, batch[0].step)
+            for task in batch:
+                schedule[task.task_id] = (task.started_at, completion)
+            free_at.append(completion)
+        free_at = free_at or [now]
+        heapq.heapify(free_at)
+        
+        # Queued tasks are assumed to run one at a time; batching only makes them finish sooner
+        for task_id in self.task_queue:
+            task = self.tasks.get(task_id)
+            if task is None or task.request is None:
+                continue
+            start = heapq.heappop(free_at)
+            completion = start + self.step_latency.run_seconds(self._eta_signature(task.request, 1))
+            schedule[task_id] = (start, completion)
+            heapq.heappush(free_at, completion)
+        
+        self._eta_schedule = schedule
+        self._eta_computed_at = time.monotonic()
+        return schedule
+    
     def _get_queue_position(self, task_id: str) -> Optional[int]:
-        if self.current_task == task_id:
+        if task_id in self.in_flight_tasks:
             return 0
         
         if self.task_queue is None:
             return None
         
-        queue_list = list(self.task_queue._queue)
-        try:
-            return queue_list.index(task_id) + (1 if self.current_task else 0)
-        except ValueError:
+        position = self.task_queue.position(task_id)
+        if position is None:
             return None
+        return position + len(self.in_flight_tasks)
+    
+    def get_task_store_stats(self) -> Dict:
+        return self.tasks.stats()
+    
+    def get_result_cache_stats(self) -> Optional[Dict]:
+        return self.result_cache.stats() if self.result_cache is not None else None
+    
+    def get_conditioning_cache_stats(self) -> Dict[str, Dict]:
+        return {generator.name: generator.conditioning_cache.stats() for generator in self.image_generators}
     
     def get_queue_size(self) -> int:
         if self.task_queue is None:
             return 0
-        return self.task_queue.qsize() + (1 if self.current_task else 0)
+        return len(self.task_queue) + len(self.in_flight_tasks)
+    
+    def _batch_signature(self, request: GenerationRequest) -> tuple:
+        width, height = get_aspect_ratios()[request.aspect_ratio]
+        return (get_quality_steps()[request.quality], width, height, get_guidance_scale(), lora_set_key(request.loras))
+    
+    def _select_next_task(self, generator: ImageGenerator) -> Optional[str]:
+        """Pop the head of the queue, or a task nearby that reuses the generator's active LoRA set"""
+        lookahead = get_adapter_grouping_lookahead()
+        if lookahead > 0:
+            candidates = self.task_queue.peek(lookahead + 1)
+            head = self.tasks.get(candidates[0]) if candidates else None
+            
+            if (head is not None and lora_set_key(head.request.loras) != generator.active_lora_key
+                    and time.time() - head.created_at < get_adapter_grouping_max_delay_seconds()):
+                for task_id in candidates[1:]:
+                    task = self.tasks.get(task_id)
+                    if task is not None and lora_set_key(task.request.loras) == generator.active_lora_key:
+                        self.task_queue.remove(task_id)
+                        return task_id
+        
+        return self.task_queue.get_nowait()
     
-    async def _worker(self):
+    def _take_matching_tasks(self, signature: tuple, limit: int) -> List[str]:
+        """Remove up to `limit` queued tasks sharing a batch signature, keeping the rest in order"""
+        def matches(task_id: str) -> bool:
+            task = self.tasks.get(task_id)
+            return task is not None and self._batch_signature(task.request) == signature
+        
+        taken = self.task_queue.take(matches, limit)
+        # Taken tasks count as in flight right away, so positions and queue size stay right during the window
+        self.in_flight_tasks.update(taken)
+        return taken
+    
+    async def _collect_batch(self, batch: List[str]):
+        """Extend batch in place with matching tasks that arrive within the batching window"""
+        max_batch_size = get_batching_max_batch_size()
+        if not get_batching_enabled() or max_batch_size <= 1:
+            return
+        
+        signature = self._batch_signature(self.tasks[batch[0]].request)
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + get_batching_window_ms() / 1000
+        
+        while True:
+            self._task_added.clear()
+            batch.extend(self._take_matching_tasks(signature, max_batch_size - len(batch)))
+            
+            remaining = deadline - loop.time()
+            if len(batch) >= max_batch_size or remaining <= 0:
+                break
+            
+            try:
+                await asyncio.wait_for(self._task_added.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                batch.extend(self._take_matching_tasks(signature, max_batch_size - len(batch)))
+                break
+    
+    async def _worker(self, index: int, generator: ImageGenerator):
         try:
-            await self.image_generator.load_model()
-            logger.info("Image generator loaded, worker started")
+            load_started = time.monotonic()
+            await generator.load_model()
+            model_load_seconds.set(time.monotonic() - load_started, generator=generator.name)
+            logger.info(f"Image generator {index} loaded, worker started")
         except Exception as e:
-            logger.error(f"Failed to load model: {e}")
+            logger.error(f"Worker {index} failed to load model: {e}")
             return
         
         while True:
+            batch: List[str] = []
             try:
-                task_id = await self.task_queue.get()
-                self.current_task = task_id
+                await self.task_queue.wait()
+                task_id = self._select_next_task(generator)
                 
-                if task_id not in self.tasks:
+                if task_id is None or task_id not in self.tasks:
                     continue
                 
-                task = self.tasks[task_id]
-                task.status = "processing"
-                task.progress = "0%"
-                
-                logger.info(f"Starting generation for task {task_id}")
-
-                from ..utils.constants import get_positive_prompt, get_negative_prompt, get_apply_lora, get_apply_embeddings
-                full_positive_prompt = task.request.prompt + get_positive_prompt()
-                full_negative_prompt = get_negative_prompt()
-                
-                logger.info(f"Task {task_id} - Full Positive Prompt: {full_positive_prompt}")
-                logger.info(f"Task {task_id} - Full Negative Prompt: {full_negative_prompt}")
-                
-                config_loras = get_apply_lora()
-                config_embeddings = get_apply_embeddings()
-                request_embedding = task.request.embedding_model
-                
-                if config_loras:
-                    logger.info(f"Task {task_id} - Config LoRAs: {', '.join(config_loras)}")
-                if config_embeddings:
-                    logger.info(f"Task {task_id} - Config Embeddings: {', '.join(config_embeddings)}")
-                if request_embedding:
-                    logger.info(f"Task {task_id} - Additional Request Embedding: {request_embedding}")
-                
-                embedding_info = f", embedding_model={task.request.embedding_model}" if task.request.embedding_model else ""
-                logger.info(f"Task {task_id} - Options: quality={task.request.quality}, aspect_ratio={task.request.aspect_ratio}{embedding_info}")
-                
-                def progress_callback(step: int, total_steps: int):
-                    progress_percent = int((step / total_steps) * 100)
-                    task.progress = f"{progress_percent}%"
+                batch = [task_id]
+                self.in_flight_tasks.add(task_id)
                 
                 try:
-                    filename = await self.image_generator.generate_image(
-                        prompt=task.request.prompt,
-                        quality=task.request.quality,
-                        aspect_ratio=task.request.aspect_ratio,
-                        embedding_model=task.request.embedding_model,
-                        progress_callback=progress_callback
-                    )
-                    
-                    task.status = "completed"
-                    task.image_url = f"/image/{filename}"
-                    task.progress = "100%"
+                    # Cancelling a collected task, or promoting its follower, edits this list in place
+                    self._collecting_batches[generator.name] = batch
+                    try:
+                        await self._collect_batch(batch)
+                    finally:
+                        self._collecting_batches.pop(generator.name, None)
                     
-                    logger.info(f"Task {task_id} completed successfully")
-                    
-                except Exception as e:
-                    task.status = "error"
-                    task.error_message = str(e)
-                    logger.error(f"Task {task_id} failed: {str(e)}")
-                
+                    finished = [
+                        batch_task_id for batch_task_id in batch
+                        if self.tasks.get(batch_task_id) is None
+                        or self.tasks[batch_task_id].status in TERMINAL_STATUSES
+                    ]
+                    if finished:
+                        self.in_flight_tasks.difference_update(finished)
+                        for batch_task_id in finished:
+                            self.tasks.release_request(batch_task_id)
+                        batch[:] = [batch_task_id for batch_task_id in batch if batch_task_id not in finished]
+                    for batch_task_id in batch:
+                        self.scheduler.on_dequeue(batch_task_id)
+                    if batch:
+                        await self._run_batch(generator, batch)
                 finally:
-                    self.current_task = None
-                    self.task_queue.task_done()
+                    self.in_flight_tasks.difference_update(batch)
+                    for batch_task_id in batch:
+                        self.tasks.release_request(batch_task_id)
+                    self._publish_queue_positions()
                     
             except Exception as e:
-                logger.error(f"Worker error: {str(e)}")
-                if self.current_task:
-                    task = self.tasks.get(self.current_task)
-                    if task:
+                logger.error(f"Worker {index} error: {str(e)}")
+                for current_task in batch:
+                    task = self.tasks.get(current_task)
+                    if task and task.status not in TERMINAL_STATUSES:
                         task.status = "error"
                         task.error_message = "Internal server error"
-                    self.current_task = None
\ No newline at end of file
+                        self._finish_task(current_task)
+                self.in_flight_tasks.difference_update(batch)
+    
+    async def _run_batch(self, generator: ImageGenerator, batch: List[str]):
+        tasks = [self.tasks[task_id] for task_id in batch]
+        quality = tasks[0].request.quality
+        aspect_ratio = tasks[0].request.aspect_ratio
+        signature = self._eta_signature(tasks[0].request, len(tasks))
+        self._running_batches[generator.name] = tasks
+        
+        for task in tasks:
+            task.status = "processing"
+            task.progress = "0%"
+            task.started_at = time.time()
+            task.total_steps = signature[2]
+            queue_wait_seconds.observe(
+                task.started_at - task.created_at,
+                quality=quality, aspect_ratio=aspect_ratio
+            )
+            tracer.record(
+                task.trace_id, "queue.wait", task.created_at, task.started_at - task.created_at, task_id=task.task_id
+            )
+            self._log_task_start(task)
+            self._publish(task.task_id)
+            if self.journal is not None:
+                self.journal.record_status(task)
+        self._publish_queue_positions()
+        
+        if len(tasks) > 1:
+            logger.info(f"Running batch of {len(tasks)} tasks: {', '.join(batch)}")
+        
+        first_step_at = None
+        last_step_at = None
+        
+        def progress_callback(step: int, total_steps: int):
+            nonlocal first_step_at, last_step_at
+            now = time.monotonic()
+            # The first gap also covers prompt encoding, so it only counts as run overhead
+            if last_step_at is not None:
+                self.step_latency.record_step(signature, now - last_step_at)
+            else:
+                first_step_at = now
+            last_step_at = now
+            steps_per_second = round(1 / self.step_latency.step_seconds(signature), 2)
+            
+            progress = f"{int((step / total_steps) * 100)}%"
+            for task in tasks:
+                if task.status != "processing":
+                    continue
+                task.step = step + 1
+                task.steps_per_second = steps_per_second
+                if task.progress != progress:
+                    task.progress = progress
+                    self._publish_threadsafe(task.task_id)
+        
+        def stage_callback(stage: str, start: float, duration: float):
+            for task in tasks:
+                tracer.record(
+                    task.trace_id, f"generate.{stage}", start, duration,
+                    task_id=task.task_id, batch_size=len(tasks), quality=quality, aspect_ratio=aspect_ratio
+                )
+        
+        def preview_callback(index: int, step: int, preview):
+            asyncio.run_coroutine_threadsafe(self._save_preview(tasks[index], step, preview), self._loop)
+        
+        work = sum(task.cost for task in tasks)
+        started_at = time.monotonic()
+        try:
+            filenames = await generator.generate_images(
+                prompts=[task.request.prompt for task in tasks],
+                quality=quality,
+                aspect_ratio=aspect_ratio,
+                embedding_models=[task.request.embedding_model for task in tasks],
+                loras=tasks[0].request.loras,
+                output_formats=[task.request.output_format for task in tasks],
+                seeds=[task.request.seed for task in tasks],
+                progress_callback=progress_callback,
+                preview_callback=preview_callback if get_previews_enabled() else None,
+                should_cancel=lambda: all(task.status == "cancelled" for task in tasks),
+                stage_callback=stage_callback
+            )
+            duration = time.monotonic() - started_at
+            self.throughput.record(work, duration)
+            self.step_latency.record_run(signature, duration)
+            labels = {"quality": quality, "aspect_ratio": aspect_ratio}
+            generation_seconds.observe(duration, **labels)
+            if last_step_at is not None and last_step_at > first_step_at:
+                steps_per_second.observe((signature[2] - 1) / (last_step_at - first_step_at), **labels)
+            
+            for task, filename in zip(tasks, filenames):
+                if task.status in TERMINAL_STATUSES:
+                    continue
+                task.status = "completed"
+                task.image_url = f"/image/{filename}"
+                task.progress = "100%"
+                self._finish_task(task.task_id)
+                logger.info(f"Task {task.task_id} completed successfully")
+            
+            await self._store_results(tasks, filenames)
+            
+        except GenerationCancelled as e:
+            logger.info(f"Batch {', '.join(batch)} stopped: {str(e)}")
+            
+        except Exception as e:
+            for task in tasks:
+                if task.status in TERMINAL_STATUSES:
+                    continue
+                task.status = "error"
+                task.error_message = str(e)
+                self._finish_task(task.task_id)
+                logger.error(f"Task {task.task_id} failed: {str(e)}")
+        
+        finally:
+            self._running_batches.pop(generator.name, None)
+            # Followers promoted mid-run replaced their leaders in tasks; keep the worker's view in sync
+            batch[:] = [task.task_id for task in tasks]
+    
+    async def _save_preview(self, task: TaskInfo, step: int, preview):
+        if task.status != "processing":
+            return
+        
+        try:
+            filename, _ = await image_encoder.save_preset(
+                preview, get_output_dir(), f"preview_{task.task_id}", get_preview_format()
+            )
+        except Exception as e:
+            logger.warning(f"Failed to save preview for task {task.task_id}: {str(e)}")
+            return
+        
+        if task.status == "processing":
+            task.preview_url = f"/image/{filename}?step={step + 1}"
+            self._publish(task.task_id)
+    
+    async def _store_results(self, tasks: List[TaskInfo], filenames: List[str]):
+        if self.result_cache is None:
+            return
+        
+        for task, filename in zip(tasks, filenames):
+            if task.cache_key is None:
+                continue
+            try:
+                await self.result_cache.store(task.cache_key, os.path.join(get_output_dir(), filename))
+            except Exception as e:
+                logger.warning(f"Failed to store task {task.task_id} in result cache: {str(e)}")
+    
+    def _log_task_start(self, task: TaskInfo):
+        task_id = task.task_id
+        logger.info(f"Starting generation for task {task_id}")
+        
+        full_positive_prompt = task.request.prompt + get_positive_prompt()
+        full_negative_prompt = get_negative_prompt()
+        
+        logger.info(f"Task {task_id} - Full Positive Prompt: {full_positive_prompt}")
+        logger.info(f"Task {task_id} - Full Negative Prompt: {full_negative_prompt}")
+        
+        config_loras = get_apply_lora()
+        config_embeddings = get_apply_embeddings()
+        request_embedding = task.request.embedding_model
+        
+        if config_loras:
+            logger.info(f"Task {task_id} - Config LoRAs: {', '.join(config_loras)}")
+        if config_embeddings:
+            logger.info(f"Task {task_id} - Config Embeddings: {', '.join(config_embeddings)}")
+        if request_embedding:
+            logger.info(f"Task {task_id} - Additional Request Embedding: {request_embedding}")
+        if task.request.loras:
+            request_loras = ', '.join(f"{name}:{weight}" for name, weight in task.request.loras.items())
+            logger.info(f"Task {task_id} - Request LoRAs: {request_loras}")
+        
+        embedding_info = f", embedding_model={task.request.embedding_model}" if task.request.embedding_model else ""
+        logger.info(f"Task {task_id} - Options: quality={task.request.quality}, aspect_ratio={task.request.aspect_ratio}{embedding_info}")
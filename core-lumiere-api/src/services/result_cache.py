@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..api.schemas import GenerationRequest
+from ..models.image_generator import SCHEDULER_NAME
+from ..utils.constants import (
+    get_model_path, get_vae_file, get_apply_lora, get_apply_embeddings, get_positive_prompt,
+    get_negative_prompt, get_quality_steps, get_aspect_ratios, get_guidance_scale,
+    get_output_formats, get_default_output_format
+)
+from ..utils.file_checksum import file_checksums
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "models")
+
+def _model_file_checksum(*parts: str) -> Optional[str]:
+    """Content checksum of a LoRA or embedding file, or None when it is missing and will be skipped"""
+    path = os.path.join(MODELS_DIR, *parts)
+    try:
+        return file_checksums.checksum(path)
+    except OSError:
+        return None
+
+def generation_key(request: GenerationRequest) -> str:
+    """Content address of everything that determines the generated image bytes
+
+    LoRAs and embeddings are keyed by file checksum as well as name, so replacing
+    a file under the same name doesn't serve images made with the old one. Hashing
+    reads the files on the first call after they change; call this off the event loop.
+    """
+    request_loras = request.loras or {}
+    embeddings = list(get_apply_embeddings()) + ([request.embedding_model] if request.embedding_model else [])
+    output_format = request.output_format or get_default_output_format()
+    width, height = get_aspect_ratios()[request.aspect_ratio]
+    parameters = {
+        "prompt": request.prompt + get_positive_prompt(),
+        "negative_prompt": get_negative_prompt(),
+        "steps": get_quality_steps()[request.quality],
+        "width": width,
+        "height": height,
+        "guidance_scale": get_guidance_scale(),
+        "seed": request.seed,
+        "scheduler": SCHEDULER_NAME,
+        "model": get_model_path(),
+        "vae": get_vae_file(),
+        "loras": sorted(get_apply_lora()),
+        "request_loras": sorted(request_loras.items()),
+        "embeddings": sorted(get_apply_embeddings()),
+        "request_embedding": request.embedding_model,
+        "lora_checksums": {
+            name: _model_file_checksum("lora", name) for name in set(get_apply_lora()) | set(request_loras)
+        },
+        "embedding_checksums": {
+            name: _model_file_checksum("embedding", f"{name}.pt") for name in embeddings
+        },
+        "output_format": [output_format, get_output_formats()[output_format]]
+    }
+    encoded = json.dumps(parameters, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+class ResultCache:
+    """On-disk LRU of generated images, keyed by generation_key and bounded by total size"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _load_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, filename, stat.st_size))
+
+        for _, filename, size in sorted(files):
+            key = os.path.splitext(filename)[0]
+            self._entries[key] = (filename, size)
+            self.total_bytes += size
+        logger.info(f"Result cache loaded {len(self._entries)} entries ({self.total_bytes} bytes)")
+
+    def lookup(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None or not os.path.exists(os.path.join(self.directory, entry[0])):
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def _drop(self, key: str):
+        filename, size = self._entries.pop(key)
+        self.total_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except OSError:
+            pass
+
+    def _copy(self, source: str, destination: str):
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    async def store(self, key: str, source_path: str):
+        if key in self._entries or not os.path.exists(source_path):
+            return
+
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return
+
+        filename = key + os.path.splitext(source_path)[1]
+        await asyncio.get_event_loop().run_in_executor(
+            None, self._copy, source_path, os.path.join(self.directory, filename)
+        )
+        self._entries[key] = (filename, size)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def materialize(self, cached_filename: str, output_dir: str, basename: str) -> str:
+        """Place a cached image into the output directory under a fresh name"""
+        filename = basename + os.path.splitext(cached_filename)[1]
+        await asyncio.get_event_loop().run_in_executor(
+            None, self._copy, os.path.join(self.directory, cached_filename), os.path.join(output_dir, filename)
+        )
+        return filename
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from .task_store import TaskInfo
+from ..api.schemas import GenerationRequest
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class TaskJournal:
+    """Append-only SQLite (WAL) journal of task submissions and status transitions
+
+    Writes are buffered and committed together every flush interval, so a burst
+    of submissions costs a single fsync. Finished tasks older than the retention
+    period are deleted at open and every prune interval after that.
+    """
+
+    def __init__(self, path: str, flush_interval_ms: int = 200, prune_interval_seconds: float = 60):
+        self.path = path
+        self.flush_interval = flush_interval_ms / 1000
+        self.prune_interval = prune_interval_seconds
+        self.retention_seconds: Optional[float] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-journal")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[str, tuple]] = []
+        self._pending_event: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "task_id TEXT UNIQUE NOT NULL, "
+            "request TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "image_url TEXT, "
+            "error_message TEXT, "
+            "created_at REAL NOT NULL, "
+            "finished_at REAL, "
+            "cache_key TEXT, "
+            "trace_id TEXT)"
+        )
+        # Journals created before cache_key and trace_id were recorded
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(tasks)")}
+        for column in ("cache_key", "trace_id"):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE tasks ADD COLUMN {column} TEXT")
+        connection.commit()
+        self._connection = connection
+
+    def _prune(self) -> int:
+        cutoff = time.time() - self.retention_seconds
+        with self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM tasks WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+            )
+        return cursor.rowcount
+
+    def _load(self) -> List[sqlite3.Row]:
+        self._open()
+        self._prune()
+        self._connection.row_factory = sqlite3.Row
+        rows = self._connection.execute("SELECT * FROM tasks ORDER BY seq").fetchall()
+        self._connection.row_factory = None
+        return rows
+
+    async def open(self, retention_seconds: float) -> List[sqlite3.Row]:
+        """Open the journal and return retained tasks in submission order"""
+        self._pending_event = asyncio.Event()
+        self.retention_seconds = retention_seconds
+        rows = await asyncio.get_event_loop().run_in_executor(self._executor, self._load)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Task journal opened at {self.path} with {len(rows)} retained tasks")
+        return rows
+
+    @staticmethod
+    def encode_request(request: GenerationRequest) -> str:
+        # Unset options are left out, so decode_request sees exactly what the client sent
+        return json.dumps(request.model_dump(exclude_none=True))
+
+    @staticmethod
+    def decode_request(encoded: str) -> GenerationRequest:
+        # Journals written before exclude_none still hold explicit nulls
+        data = {key: value for key, value in json.loads(encoded).items() if value is not None}
+        return GenerationRequest(**data)
+
+    def record_added(self, task: TaskInfo):
+        self._append(
+            "INSERT OR REPLACE INTO tasks (task_id, request, status, created_at, cache_key, trace_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (task.task_id, self.encode_request(task.request), task.status, task.created_at,
+             task.cache_key, task.trace_id)
+        )
+
+    def record_status(self, task: TaskInfo):
+        self._append(
+            "UPDATE tasks SET status = ?, image_url = ?, error_message = ?, finished_at = ? WHERE task_id = ?",
+            (task.status, task.image_url, task.error_message, task.finished_at, task.task_id)
+        )
+
+    def _append(self, statement: str, params: tuple):
+        self._pending.append((statement, params))
+        if self._pending_event is not None:
+            self._pending_event.set()
+
+    def _write(self, batch: List[Tuple[str, tuple]]):
+        with self._connection:
+            for statement, params in batch:
+                self._connection.execute(statement, params)
+
+    async def flush(self):
+        if not self._pending or self._connection is None:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.get_event_loop().run_in_executor(self._executor, self._write, batch)
+        except Exception as e:
+            logger.error(f"Failed to write task journal: {str(e)}")
+
+    async def prune(self):
+        if self._connection is None:
+            return
+        try:
+            deleted = await asyncio.get_event_loop().run_in_executor(self._executor, self._prune)
+        except Exception as e:
+            logger.error(f"Failed to prune task journal: {str(e)}")
+            return
+        if deleted:
+            logger.info(f"Pruned {deleted} finished tasks from the task journal")
+
+    async def _flush_loop(self):
+        next_prune = time.monotonic() + self.prune_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._pending_event.wait(), timeout=max(0, next_prune - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            if self._pending_event.is_set():
+                await asyncio.sleep(self.flush_interval)
+                self._pending_event.clear()
+                await self.flush()
+            if time.monotonic() >= next_prune:
+                await self.prune()
+                next_prune = time.monotonic() + self.prune_interval
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._connection is not None:
+            await asyncio.get_event_loop().run_in_executor(self._executor, self._connection.close)
+            self._connection = None
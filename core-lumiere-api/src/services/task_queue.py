@@ -0,0 +1,98 @@
+import asyncio
+import bisect
+import itertools
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+class TaskQueue:
+    """Ordered task queue with O(log n) position lookups
+
+    Entries are kept in a sorted list of (*priority, sequence, task_id) keys, so
+    the position of a task is a binary search for its key instead of a scan.
+    Finding a task to insert or remove is also a binary search, but shifting the
+    list behind it is O(n); that is a single memmove of pointers, cheap at the
+    queue depths admission control allows.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple] = []
+        self._key_by_task: Dict[str, Tuple] = {}
+        self._sequence = itertools.count()
+        self._not_empty = asyncio.Event()
+
+    def put(self, task_id: str, priority: Tuple = ()):
+        if task_id in self._key_by_task:
+            raise ValueError(f"Task {task_id} is already queued")
+
+        key = (*priority, next(self._sequence), task_id)
+        self._key_by_task[task_id] = key
+        bisect.insort(self._keys, key)
+        self._not_empty.set()
+
+    async def wait(self):
+        while not self._keys:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+    async def get(self) -> str:
+        await self.wait()
+        return self._pop(0)
+
+    def peek(self, count: int) -> List[str]:
+        return [key[-1] for key in self._keys[:count]]
+
+    def get_nowait(self) -> Optional[str]:
+        if not self._keys:
+            return None
+        return self._pop(0)
+
+    def _pop(self, index: int) -> str:
+        key = self._keys.pop(index)
+        task_id = key[-1]
+        del self._key_by_task[task_id]
+        return task_id
+
+    def remove(self, task_id: str) -> bool:
+        key = self._key_by_task.get(task_id)
+        if key is None:
+            return False
+        self._pop(bisect.bisect_left(self._keys, key))
+        return True
+
+    def replace(self, task_id: str, new_task_id: str) -> bool:
+        """Hand task_id's place in the queue to new_task_id"""
+        key = self._key_by_task.pop(task_id, None)
+        if key is None:
+            return False
+        new_key = (*key[:-1], new_task_id)
+        self._keys[bisect.bisect_left(self._keys, key)] = new_key
+        self._key_by_task[new_task_id] = new_key
+        return True
+
+    def position(self, task_id: str) -> Optional[int]:
+        """Zero-based number of queued tasks ahead of task_id"""
+        key = self._key_by_task.get(task_id)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._keys, key)
+
+    def take(self, predicate: Callable[[str], bool], limit: int) -> List[str]:
+        """Remove up to `limit` tasks matching predicate, in queue order"""
+        taken = []
+        for key in self._keys:
+            if len(taken) >= limit:
+                break
+            if predicate(key[-1]):
+                taken.append(key[-1])
+
+        for task_id in taken:
+            self.remove(task_id)
+        return taken
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._key_by_task
+
+    def __iter__(self) -> Iterator[str]:
+        return (key[-1] for key in list(self._keys))
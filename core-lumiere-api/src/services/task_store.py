@@ -0,0 +1,134 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional
+
+from ..api.schemas import GenerationRequest
+
+class TaskInfo:
+    __slots__ = (
+        "task_id", "request", "status", "progress", "image_url",
+        "error_message", "preview_url", "created_at", "finished_at", "cache_key",
+        "client_id", "cost", "started_at", "step", "total_steps", "steps_per_second", "trace_id"
+    )
+
+    def __init__(self, task_id: str, request: Optional[GenerationRequest]):
+        self.task_id = task_id
+        self.request = request
+        self.status = "queued"
+        self.progress = "0%"
+        self.image_url = None
+        self.error_message = None
+        self.preview_url = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cache_key: Optional[str] = None
+        self.client_id: Optional[str] = None
+        self.cost = 0.0
+        self.started_at: Optional[float] = None
+        self.step = 0
+        self.total_steps = 0
+        self.steps_per_second: Optional[float] = None
+        self.trace_id: Optional[str] = None
+
+    def estimate_bytes(self) -> int:
+        """Rough resident size: the slot object plus the serialized request and result strings"""
+        size = sys.getsizeof(self)
+        if self.request is not None:
+            size += len(self.request.model_dump_json(exclude_none=True))
+        for value in (self.task_id, self.image_url, self.error_message, self.preview_url,
+                      self.cache_key, self.client_id, self.trace_id):
+            if value is not None:
+                size += sys.getsizeof(value)
+        return size
+
+class TaskStore:
+    """Task registry that evicts finished tasks after a TTL or when over capacity"""
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._tasks: Dict[str, TaskInfo] = {}
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.resident_bytes = 0
+        self.ttl_evictions = 0
+        self.capacity_evictions = 0
+
+    def _measure(self, task: TaskInfo):
+        """Re-estimate a task's size; done when it is added, finishes and drops its request"""
+        size = task.estimate_bytes()
+        self.resident_bytes += size - self._sizes.get(task.task_id, 0)
+        self._sizes[task.task_id] = size
+
+    def _forget(self, task_id: str):
+        self.resident_bytes -= self._sizes.pop(task_id, 0)
+
+    def add(self, task: TaskInfo):
+        self._tasks[task.task_id] = task
+        self._measure(task)
+        self.evict()
+
+    def get(self, task_id: str) -> Optional[TaskInfo]:
+        return self._tasks.get(task_id)
+
+    def __getitem__(self, task_id: str) -> TaskInfo:
+        return self._tasks[task_id]
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._tasks))
+
+    def mark_finished(self, task_id: str, finished_at: Optional[float] = None, release_request: bool = True):
+        """Start the retention clock and drop the request, unless a running batch still reads it"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        task.finished_at = finished_at or time.time()
+        if release_request:
+            task.request = None
+        self._measure(task)
+        self._finished[task_id] = task.finished_at
+        self._finished.move_to_end(task_id)
+        self.evict()
+
+    def release_request(self, task_id: str):
+        """Drop the request of a finished task whose batch has ended"""
+        task = self._tasks.get(task_id)
+        if task is not None and task.finished_at is not None:
+            task.request = None
+            self._measure(task)
+
+    def discard(self, task_id: str):
+        self._tasks.pop(task_id, None)
+        self._finished.pop(task_id, None)
+        self._forget(task_id)
+
+    def evict(self):
+        now = time.time()
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            if now - finished_at > self.ttl_seconds:
+                self.ttl_evictions += 1
+            elif len(self._tasks) > self.max_entries:
+                self.capacity_evictions += 1
+            else:
+                break
+            self._finished.popitem(last=False)
+            self._tasks.pop(task_id, None)
+            self._forget(task_id)
+
+    def stats(self) -> dict:
+        return {
+            "resident": len(self._tasks),
+            "finished": len(self._finished),
+            "active": len(self._tasks) - len(self._finished),
+            "resident_bytes": self.resident_bytes,
+            "ttl_evictions": self.ttl_evictions,
+            "capacity_evictions": self.capacity_evictions
+        }
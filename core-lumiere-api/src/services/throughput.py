@@ -0,0 +1,82 @@
+import threading
+from typing import Dict, Tuple
+
+class ThroughputEstimator:
+    """Rolling estimate of generation speed in seconds per megapixel-step
+
+    A megapixel-step is one denoising step over one megapixel of output, the same
+    unit FairScheduler uses for task cost, so queued work converts to seconds.
+    """
+
+    def __init__(self, initial_seconds_per_unit: float, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        self._seconds_per_unit = initial_seconds_per_unit
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, work_units: float, seconds: float):
+        if work_units <= 0 or seconds <= 0:
+            return
+        sample = seconds / work_units
+        with self._lock:
+            if self._samples == 0:
+                self._seconds_per_unit = sample
+            else:
+                self._seconds_per_unit += self.smoothing * (sample - self._seconds_per_unit)
+            self._samples += 1
+
+    @property
+    def seconds_per_unit(self) -> float:
+        return self._seconds_per_unit
+
+    @property
+    def samples(self) -> int:
+        return self._samples
+
+class StepLatencyEstimator:
+    """Rolling per-step latency and fixed per-run overhead for each (width, height, steps, batch) signature
+
+    Step latency comes from the gaps between step callbacks; overhead is whatever
+    the run took beyond its steps (prompt encoding, VAE decode, encoding output).
+    Unseen signatures fall back to the megapixel-step ThroughputEstimator.
+    """
+
+    def __init__(self, fallback: ThroughputEstimator, smoothing: float = 0.2):
+        self.fallback = fallback
+        self.smoothing = smoothing
+        self._step_seconds: Dict[Tuple, float] = {}
+        self._overhead_seconds: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _smooth(self, table: Dict[Tuple, float], signature: Tuple, sample: float):
+        previous = table.get(signature)
+        table[signature] = sample if previous is None else previous + self.smoothing * (sample - previous)
+
+    def record_step(self, signature: Tuple, seconds: float):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._smooth(self._step_seconds, signature, seconds)
+
+    def record_run(self, signature: Tuple, seconds: float):
+        steps = signature[2]
+        with self._lock:
+            step_seconds = self._step_seconds.get(signature)
+            if step_seconds is not None:
+                self._smooth(self._overhead_seconds, signature, max(0.0, seconds - steps * step_seconds))
+
+    def step_seconds(self, signature: Tuple) -> float:
+        step_seconds = self._step_seconds.get(signature)
+        if step_seconds is not None:
+            return step_seconds
+        width, height, _, batch_size = signature
+        return self.fallback.seconds_per_unit * width * height * batch_size / (1024 * 1024)
+
+    def overhead_seconds(self, signature: Tuple) -> float:
+        return self._overhead_seconds.get(signature, 0.0)
+
+    def run_seconds(self, signature: Tuple) -> float:
+        return signature[2] * self.step_seconds(signature) + self.overhead_seconds(signature)
+
+    def remaining_seconds(self, signature: Tuple, steps_done: int) -> float:
+        return max(0, signature[2] - steps_done) * self.step_seconds(signature) + self.overhead_seconds(signature)
@@ -1,6 +1,7 @@
 from fastapi import WebSocket
+import asyncio
 import json
-from typing import Dict, List
+from typing import Callable, Dict, List, Set, Tuple
 
 from ..utils.logger import get_logger
 
@@ -9,6 +10,7 @@ logger = get_logger(__name__)
 class WebSocketManager:
     def __init__(self):
         self.connections: Dict[str, List[WebSocket]] = {}
+        self.streams: Set[WebSocket] = set()
     
     async def connect(self, websocket: WebSocket, task_id: str):
         await websocket.accept()
@@ -28,25 +30,57 @@ class WebSocketManager:
                 del self.connections[task_id]
         logger.info(f"WebSocket disconnected for task {task_id}")
     
+    async def send_to_websocket(self, task_id: str, websocket: WebSocket, status_data: Dict) -> bool:
+        try:
+            if websocket.client_state.name == "CONNECTED":
+                await websocket.send_text(json.dumps(status_data))
+                return True
+        except Exception as e:
+            logger.warning(f"Failed to send message to WebSocket: {str(e)}")
+        
+        self.disconnect(task_id, websocket)
+        return False
+    
     async def send_status_update(self, task_id: str, status_data: Dict):
         if task_id not in self.connections:
             return
         
-        message = json.dumps(status_data)
-        disconnected = []
-        
-        for websocket in self.connections[task_id]:
+        for websocket in list(self.connections[task_id]):
+            await self.send_to_websocket(task_id, websocket, status_data)
+    
+    async def push_task_updates(self, task_id: str, websocket: WebSocket, channel: asyncio.Queue,
+                                status_data: Dict, terminal_statuses: Tuple[str, ...]):
+        """Forward published status changes to one socket until the task reaches a terminal state"""
+        while True:
+            if not await self.send_to_websocket(task_id, websocket, status_data):
+                return
+            if status_data.get("status") in terminal_statuses:
+                return
+            _, status_data = await channel.get()
+    
+    async def connect_stream(self, websocket: WebSocket):
+        await websocket.accept()
+        self.streams.add(websocket)
+        logger.info(f"Status stream connected ({len(self.streams)} open)")
+    
+    def disconnect_stream(self, websocket: WebSocket):
+        self.streams.discard(websocket)
+        logger.info(f"Status stream disconnected ({len(self.streams)} open)")
+    
+    async def push_stream_updates(self, websocket: WebSocket, channel: asyncio.Queue, subscriptions: Set[str],
+                                  unsubscribe: Callable[[str, asyncio.Queue], None],
+                                  terminal_statuses: Tuple[str, ...]):
+        """Forward status changes of every subscribed task to one multiplexed socket"""
+        while True:
+            task_id, status_data = await channel.get()
+            if status_data.get("status") in terminal_statuses and task_id in subscriptions:
+                subscriptions.discard(task_id)
+                unsubscribe(task_id, channel)
             try:
-                if websocket.client_state.name == "CONNECTED":
-                    await websocket.send_text(message)
-                else:
-                    disconnected.append(websocket)
+                await websocket.send_text(json.dumps({"task_id": task_id, **status_data}))
             except Exception as e:
-                logger.warning(f"Failed to send message to WebSocket: {str(e)}")
-                disconnected.append(websocket)
-        
-        for websocket in disconnected:
-            self.disconnect(task_id, websocket)
+                logger.warning(f"Failed to send message to status stream: {str(e)}")
+                return
     
     async def broadcast_to_task(self, task_id: str, message: str):
         if task_id in self.connections:
@@ -2,6 +2,8 @@ import json
 import os
 from typing import Dict, Any
 
+_MISSING = object()
+
 class ConfigError(Exception):
     pass
 
@@ -30,13 +32,15 @@ class Config:
     def reload(self):
         self._config = self._load_config()
     
-    def get(self, key_path: str):
+    def get(self, key_path: str, default: Any = _MISSING):
         keys = key_path.split('.')
         value = self._config
         
         for key in keys:
             if isinstance(value, dict) and key in value:
                 value = value[key]
+            elif default is not _MISSING:
+                return default
             else:
                 raise ConfigError(f"Configuration key '{key_path}' not found in core-api config")
         
@@ -60,6 +64,18 @@ class Config:
     def get_apply_embeddings(self):
         return self.get('model.apply_embeddings')
     
+    def get_max_loaded_embeddings(self):
+        return self.get('model.max_loaded_embeddings', 0)
+    
+    def get_lora_fuse_threshold(self):
+        return self.get('model.lora_fuse_threshold', 0)
+    
+    def get_max_request_loras(self):
+        return self.get('model.max_request_loras', 4)
+    
+    def get_model_devices(self):
+        return self.get('model.devices', [])
+    
     def get_positive_prompt(self):
         return self.get('generation.positive_prompt')
     
@@ -81,5 +97,116 @@ class Config:
             raise ConfigError("aspect_ratios is empty in config")
         return aspect_ratios
     
+    def get_conditioning_cache_max_entries(self):
+        return self.get('generation.conditioning_cache.max_entries', 256)
+    
+    def get_conditioning_cache_max_megabytes(self):
+        return self.get('generation.conditioning_cache.max_megabytes', 256)
+    
+    def get_worker_count(self):
+        return self.get('queue.workers', 1)
+    
+    def get_cpu_threads_per_worker(self):
+        return self.get('queue.cpu_threads_per_worker', 0)
+    
+    def get_pin_cpu_workers(self):
+        return self.get('queue.pin_cpu_workers', False)
+    
+    def get_task_ttl_seconds(self):
+        return self.get('queue.task_store.ttl_seconds', 3600)
+    
+    def get_task_store_max_entries(self):
+        return self.get('queue.task_store.max_entries', 10000)
+    
+    def get_journal_enabled(self):
+        return self.get('queue.journal.enabled', False)
+    
+    def get_journal_path(self):
+        path = self.get('queue.journal.path', os.path.join("journal", "tasks.db"))
+        return os.path.join(os.path.dirname(self.config_path), path)
+    
+    def get_journal_flush_interval_ms(self):
+        return self.get('queue.journal.flush_interval_ms', 200)
+    
+    def get_journal_prune_interval_seconds(self):
+        return self.get('queue.journal.prune_interval_seconds', 60)
+    
+    def get_adapter_grouping_lookahead(self):
+        return self.get('queue.adapter_grouping.lookahead', 0)
+    
+    def get_adapter_grouping_max_delay_seconds(self):
+        return self.get('queue.adapter_grouping.max_delay_seconds', 30)
+    
+    def get_output_formats(self):
+        return self.get('output.formats', {"png": {"format": "PNG", "compress_level": 6}})
+    
+    def get_default_output_format(self):
+        return self.get('output.default_format', "png")
+    
+    def get_encoder_threads(self):
+        return self.get('output.encoder_threads', 2)
+    
+    def get_result_cache_enabled(self):
+        return self.get('result_cache.enabled', False)
+    
+    def get_result_cache_path(self):
+        path = self.get('result_cache.path', os.path.join("cache", "results"))
+        return os.path.join(os.path.dirname(self.config_path), path)
+    
+    def get_result_cache_max_megabytes(self):
+        return self.get('result_cache.max_megabytes', 1024)
+    
+    def get_result_cache_unseeded(self):
+        return self.get('result_cache.cache_unseeded', False)
+    
+    def get_previews_enabled(self):
+        return self.get('previews.enabled', False)
+    
+    def get_preview_every_n_steps(self):
+        return self.get('previews.every_n_steps', 5)
+    
+    def get_preview_format(self):
+        return self.get('previews.format', {"format": "JPEG", "quality": 70})
+    
+    def get_scheduling_policy(self):
+        return self.get('scheduling.policy', "fifo")
+    
+    def get_scheduling_tenant(self):
+        return self.get('scheduling.tenant', "user")
+    
+    def get_priority_classes(self):
+        return self.get('scheduling.priority_classes', {"normal": 1.0})
+    
+    def get_default_priority_class(self):
+        return self.get('scheduling.default_priority_class', "normal")
+    
+    def get_admission_max_queue_depth(self):
+        return self.get('admission.max_queue_depth', 0)
+    
+    def get_admission_max_pending_seconds(self):
+        return self.get('admission.max_pending_seconds', 0)
+    
+    def get_admission_max_tasks_per_client(self):
+        return self.get('admission.max_tasks_per_client', 0)
+    
+    def get_initial_seconds_per_megapixel_step(self):
+        return self.get('admission.initial_seconds_per_megapixel_step', 0.25)
+    
+    def get_tracing_enabled(self):
+        return self.get('tracing.enabled', False)
+    
+    def get_tracing_path(self):
+        path = self.get('tracing.path', os.path.join("traces", "api.jsonl"))
+        return os.path.join(os.path.dirname(self.config_path), path)
+    
+    def get_batching_enabled(self):
+        return self.get('queue.batching.enabled', False)
+    
+    def get_batching_max_batch_size(self):
+        return self.get('queue.batching.max_batch_size', 4)
+    
+    def get_batching_window_ms(self):
+        return self.get('queue.batching.window_ms', 200)
+    
 
 config = Config()
\ No newline at end of file
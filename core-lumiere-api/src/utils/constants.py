@@ -12,6 +12,27 @@ def get_apply_lora():
 def get_apply_embeddings():
     return config.get_apply_embeddings()
 
+def get_max_loaded_embeddings():
+    return config.get_max_loaded_embeddings()
+
+def get_lora_fuse_threshold():
+    return config.get_lora_fuse_threshold()
+
+def get_max_request_loras():
+    return config.get_max_request_loras()
+
+def get_model_devices():
+    return config.get_model_devices()
+
+def get_worker_count():
+    return config.get_worker_count()
+
+def get_cpu_threads_per_worker():
+    return config.get_cpu_threads_per_worker()
+
+def get_pin_cpu_workers():
+    return config.get_pin_cpu_workers()
+
 def get_positive_prompt():
     return config.get_positive_prompt()
 
@@ -28,3 +49,101 @@ def get_aspect_ratios():
     _aspect_ratios = config.get_aspect_ratios()
     return {k: tuple(v) for k, v in _aspect_ratios.items()}
 
+def get_conditioning_cache_max_entries():
+    return config.get_conditioning_cache_max_entries()
+
+def get_conditioning_cache_max_megabytes():
+    return config.get_conditioning_cache_max_megabytes()
+
+def get_task_ttl_seconds():
+    return config.get_task_ttl_seconds()
+
+def get_task_store_max_entries():
+    return config.get_task_store_max_entries()
+
+def get_journal_enabled():
+    return config.get_journal_enabled()
+
+def get_journal_path():
+    return config.get_journal_path()
+
+def get_journal_flush_interval_ms():
+    return config.get_journal_flush_interval_ms()
+
+def get_journal_prune_interval_seconds():
+    return config.get_journal_prune_interval_seconds()
+
+def get_adapter_grouping_lookahead():
+    return config.get_adapter_grouping_lookahead()
+
+def get_adapter_grouping_max_delay_seconds():
+    return config.get_adapter_grouping_max_delay_seconds()
+
+def get_output_formats():
+    return config.get_output_formats()
+
+def get_default_output_format():
+    return config.get_default_output_format()
+
+def get_encoder_threads():
+    return config.get_encoder_threads()
+
+def get_result_cache_enabled():
+    return config.get_result_cache_enabled()
+
+def get_result_cache_path():
+    return config.get_result_cache_path()
+
+def get_result_cache_max_megabytes():
+    return config.get_result_cache_max_megabytes()
+
+def get_result_cache_unseeded():
+    return config.get_result_cache_unseeded()
+
+def get_previews_enabled():
+    return config.get_previews_enabled()
+
+def get_preview_every_n_steps():
+    return config.get_preview_every_n_steps()
+
+def get_preview_format():
+    return config.get_preview_format()
+
+def get_scheduling_policy():
+    return config.get_scheduling_policy()
+
+def get_scheduling_tenant():
+    return config.get_scheduling_tenant()
+
+def get_priority_classes():
+    return config.get_priority_classes()
+
+def get_default_priority_class():
+    return config.get_default_priority_class()
+
+def get_admission_max_queue_depth():
+    return config.get_admission_max_queue_depth()
+
+def get_admission_max_pending_seconds():
+    return config.get_admission_max_pending_seconds()
+
+def get_admission_max_tasks_per_client():
+    return config.get_admission_max_tasks_per_client()
+
+def get_initial_seconds_per_megapixel_step():
+    return config.get_initial_seconds_per_megapixel_step()
+
+def get_tracing_enabled():
+    return config.get_tracing_enabled()
+
+def get_tracing_path():
+    return config.get_tracing_path()
+
+def get_batching_enabled():
+    return config.get_batching_enabled()
+
+def get_batching_max_batch_size():
+    return config.get_batching_max_batch_size()
+
+def get_batching_window_ms():
+    return config.get_batching_window_ms()
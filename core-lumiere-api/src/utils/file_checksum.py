@@ -0,0 +1,29 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+class FileChecksums:
+    """SHA-256 of model files, recomputed only when a file's mtime or size changes"""
+
+    def __init__(self):
+        self._checksums: Dict[str, Tuple[float, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def checksum(self, path: str) -> str:
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._checksums.get(path)
+        if cached is not None and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        checksum = digest.hexdigest()
+        with self._lock:
+            self._checksums[path] = (stat.st_mtime, stat.st_size, checksum)
+        return checksum
+
+file_checksums = FileChecksums()
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from .constants import get_output_formats, get_default_output_format, get_encoder_threads
+from .metrics import encode_seconds, image_bytes
+
+FORMAT_EXTENSIONS = {
+    "PNG": ("png", "image/png"),
+    "WEBP": ("webp", "image/webp"),
+    "JPEG": ("jpg", "image/jpeg")
+}
+
+MEDIA_TYPES = {f".{extension}": media_type for extension, media_type in FORMAT_EXTENSIONS.values()}
+
+def get_media_type(filename: str) -> str:
+    return MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+class ImageEncoder:
+    """Encodes and writes generated images on a dedicated executor, off the event loop"""
+
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=get_encoder_threads(), thread_name_prefix="image-encoder")
+        return self._executor
+
+    def resolve_preset(self, preset: Dict) -> Tuple[str, Dict]:
+        """Return (extension, PIL save options) for a format preset such as {"format": "WEBP", "quality": 90}"""
+        options = dict(preset)
+        pil_format = options.pop("format").upper()
+        extension, _ = FORMAT_EXTENSIONS[pil_format]
+        options["format"] = pil_format
+        return extension, options
+
+    def _encode_to_file(self, image: Image.Image, path: str, options: Dict, record_metrics: bool = False) -> int:
+        started = time.perf_counter()
+        if options["format"] == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(path, **options)
+        size = os.path.getsize(path)
+        if record_metrics:
+            encode_seconds.observe(time.perf_counter() - started, format=options["format"].lower())
+            image_bytes.observe(size, format=options["format"].lower())
+        return size
+
+    async def save(self, image: Image.Image, directory: str, basename: str,
+                   output_format: Optional[str] = None) -> Tuple[str, int]:
+        """Encode image into directory using a configured output format; returns (filename, size in bytes)"""
+        preset = get_output_formats()[output_format or get_default_output_format()]
+        return await self.save_preset(image, directory, basename, preset, record_metrics=True)
+
+    async def save_preset(self, image: Image.Image, directory: str, basename: str,
+                          preset: Dict, record_metrics: bool = False) -> Tuple[str, int]:
+        extension, options = self.resolve_preset(preset)
+        filename = f"{basename}.{extension}"
+        size = await asyncio.get_event_loop().run_in_executor(
+            self._get_executor(), self._encode_to_file, image, os.path.join(directory, filename), options, record_metrics
+        )
+        return filename, size
+
+image_encoder = ImageEncoder()
@@ -5,6 +5,8 @@ import zipfile
 import asyncio
 from typing import Optional
 
+IMAGE_EXTENSIONS = ('.png', '.webp', '.jpg')
+
 class LogManager:
     def __init__(self, log_dir: str = "logs/latest"):
         self.project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -63,7 +65,7 @@ class LogManager:
                         if file.endswith('.log') and file != today_log:
                             file_path = os.path.join(root, file)
                             files_to_archive.append((file_path, file))
-                        elif file.endswith('.png'):
+                        elif file.endswith(IMAGE_EXTENSIONS):
                             file_path = os.path.join(root, file)
                             try:
                                 file_date = datetime.fromtimestamp(os.path.getctime(file_path)).strftime("%y%m%d")
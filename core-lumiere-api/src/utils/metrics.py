@@ -0,0 +1,199 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = (64 * 1024, 256 * 1024, 512 * 1024, 1024 ** 2, 2 * 1024 ** 2, 4 * 1024 ** 2, 8 * 1024 ** 2, 16 * 1024 ** 2)
+RATE_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+def _format_labels(label_names: Sequence[str], label_values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def _callback_samples(self, callback: Callable[[], object]) -> List[str]:
+        """Read a value, or a mapping of label values to values, at scrape time"""
+        value = callback()
+        if not isinstance(value, dict):
+            return [f"{self.name} {_format_value(value)}"]
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(sample)}" for key, sample in value.items()]
+
+class Counter(_Metric):
+    """Counter that is either incremented here or read from a component's own totals at scrape time"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 callback: Optional[Callable[[], object]] = None):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        if self.callback is not None:
+            return self._callback_samples(self.callback)
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(_Metric):
+    """Gauge that is either set explicitly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 callback: Optional[Callable[[], object]] = None):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self.callback is not None:
+            return self._callback_samples(self.callback)
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = SECONDS_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts followed by the +Inf count and the sum
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [(key, list(series)) for key, series in self._series.items()]
+
+        lines = []
+        for key, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format
+
+    Updates take a per-metric lock around a couple of dict operations, and nothing
+    is recorded per denoising step, so instrumentation stays off the hot path.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                callback: Optional[Callable[[], object]] = None) -> Counter:
+        return self._register(Counter(name, documentation, label_names, callback))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = (),
+              callback: Optional[Callable[[], object]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names, callback))
+
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = SECONDS_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+TASK_LABELS = ("quality", "aspect_ratio")
+
+queue_wait_seconds = metrics.histogram(
+    "lumiere_queue_wait_seconds", "Time tasks spent queued before generation started", TASK_LABELS
+)
+generation_seconds = metrics.histogram(
+    "lumiere_generation_seconds", "Wall time of a generation batch, from pipeline start to saved images", TASK_LABELS
+)
+steps_per_second = metrics.histogram(
+    "lumiere_steps_per_second", "Denoising steps per second measured over a batch", TASK_LABELS, buckets=RATE_BUCKETS
+)
+encode_seconds = metrics.histogram(
+    "lumiere_encode_seconds", "Time to encode and write one image", ("format",)
+)
+image_bytes = metrics.histogram(
+    "lumiere_image_bytes", "Size of encoded images", ("format",), buckets=BYTES_BUCKETS
+)
+tasks_total = metrics.counter(
+    "lumiere_tasks_total", "Tasks that reached a terminal status", ("outcome",) + TASK_LABELS
+)
+tasks_rejected_total = metrics.counter(
+    "lumiere_tasks_rejected_total", "Generation requests rejected by admission control"
+)
+model_load_seconds = metrics.gauge(
+    "lumiere_model_load_seconds", "Time taken to load the model on each generator", ("generator",)
+)
@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from .constants import get_tracing_enabled, get_tracing_path
+
+class SpanRecorder:
+    """Appends timed spans as JSON lines, one object per span
+
+    Records carry the trace ID generated by the bot, so the bot's and the API's
+    span files can be merged per trace by tools/trace_report.py.
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self._file = None
+        self._lock = threading.Lock()
+        self._enabled: Optional[bool] = None
+
+    @property
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            self._enabled = get_tracing_enabled()
+        return self._enabled
+
+    def _get_file(self):
+        if self._file is None:
+            path = get_tracing_path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8', buffering=1)
+        return self._file
+
+    def record(self, trace_id: Optional[str], name: str, start: float, duration: float, **attributes):
+        """Record a span that started at unix time `start` and lasted `duration` seconds"""
+        if not trace_id or not self.enabled:
+            return
+        line = json.dumps({
+            "trace_id": trace_id,
+            "service": self.service,
+            "span": name,
+            "start": round(start, 6),
+            "duration_ms": round(duration * 1000, 3),
+            **attributes
+        }, ensure_ascii=False)
+        with self._lock:
+            self._get_file().write(line + "\n")
+
+    @contextmanager
+    def span(self, trace_id: Optional[str], name: str, **attributes):
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(trace_id, name, start, time.perf_counter() - started, **attributes)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+tracer = SpanRecorder("api")
@@ -0,0 +1,88 @@
+"""Accuracy and cost of the local translation skip in PromptEnhancer
+
+Classifies every prompt of a labelled JSON-lines corpus ({"prompt", "language"})
+with utils.language_detect and reports accuracy, misclassified prompts, the
+detector's own time per prompt, and the translator round trips it avoids. The
+translator latency comes from the enhance.translate spans of a bot trace file
+when one is given, otherwise from --translate-ms:
+
+    python benchmarks/bench_language_detect.py
+    python benchmarks/bench_language_detect.py --trace ../traces/bot.jsonl
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.language_detect import detect_script, needs_translation
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_corpus.jsonl")
+
+def load_corpus(path: str) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def translate_latency_from_trace(path: str) -> Optional[float]:
+    """Median enhance.translate duration in a bot span file, in milliseconds"""
+    durations = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if span.get("span") == "enhance.translate":
+                durations.append(span["duration_ms"])
+    return statistics.median(durations) if durations else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local English detector against a labelled prompt corpus")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeats", type=int, default=1000, help="timing passes over the corpus")
+    parser.add_argument("--trace", help="bot span file to take the translator latency from")
+    parser.add_argument("--translate-ms", type=float, default=600.0, help="translator latency when no trace is given")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    misclassified = []
+    for entry in corpus:
+        expected = entry["language"] != "en"
+        if needs_translation(entry["prompt"]) != expected:
+            misclassified.append({**entry, "detected": detect_script(entry["prompt"])})
+
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        for entry in corpus:
+            needs_translation(entry["prompt"])
+    per_prompt_us = (time.perf_counter() - started) / (args.repeats * len(corpus)) * 1e6
+
+    translate_ms = args.translate_ms
+    if args.trace:
+        translate_ms = translate_latency_from_trace(args.trace) or translate_ms
+
+    # Only prompts that are English and detected as such skip the translator call
+    skipped = sum(
+        1 for entry in corpus
+        if entry["language"] == "en" and not needs_translation(entry["prompt"])
+    )
+
+    report = {
+        "corpus": os.path.relpath(args.corpus),
+        "prompts": len(corpus),
+        "english": sum(1 for entry in corpus if entry["language"] == "en"),
+        "accuracy": round(1 - len(misclassified) / len(corpus), 4),
+        "misclassified": misclassified,
+        "detect_us_per_prompt": round(per_prompt_us, 3),
+        "translate_ms": translate_ms,
+        "translations_skipped": skipped,
+        "saved_ms_per_command": round(skipped / len(corpus) * translate_ms - per_prompt_us / 1000, 3)
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
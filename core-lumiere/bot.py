@@ -10,6 +10,10 @@ sys.path.append(os.path.dirname(__file__))
 
 from utils.config import config, ConfigError
 from utils.language import lang
+from utils.api_client import ApiClient
+from utils.status_stream import StatusStream
+from utils.edit_coalescer import EditCoalescer
+from utils.prompt_cache import prompt_cache
 from commands.create import create_image_command, get_quality_choices, get_ratio_choices
 
 logging.basicConfig(level=logging.INFO)
@@ -24,9 +28,13 @@ class LumiereBot(commands.Bot):
             intents=intents,
             help_command=None
         )
+        self.api_client = ApiClient()
+        self.status_stream = StatusStream(self.api_client)
+        self.edit_coalescer = EditCoalescer()
         
     async def setup_hook(self):
         try:
+            await self.api_client.start()
             logger.info("Setting up slash commands...")
             guild_ids = config.get_guild_ids()
             if guild_ids:
@@ -44,6 +52,13 @@ class LumiereBot(commands.Bot):
         except Exception as e:
             logger.error(f"Error during setup: {e}", exc_info=True)
     
+    async def close(self):
+        await self.edit_coalescer.close()
+        await self.status_stream.close()
+        await self.api_client.close()
+        prompt_cache.close()
+        await super().close()
+    
     async def on_ready(self):
         logger.info(f'{self.user} connected to Discord!')
         logger.info(f'Bot is in {len(self.guilds)} guilds')
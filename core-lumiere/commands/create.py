@@ -3,10 +3,9 @@ from discord import app_commands
 from typing import Optional, List
 import aiohttp
 import asyncio
-import websockets
-import json
 import io
 import logging
+import time
 
 import sys
 import os
@@ -16,9 +15,23 @@ from utils.config import config, ConfigError
 from utils.language import lang
 from utils.template_loader import template_loader
 from utils.prompt_enhancer import prompt_enhancer
+from utils.tracing import tracer
+from utils.api_client import ApiClient
+from utils.status_stream import StatusStream
+from utils.edit_coalescer import EditCoalescer
 
 logger = logging.getLogger(__name__)
 
+def format_eta(status_update: dict) -> str:
+    lines = []
+    if status_update.get("eta_start"):
+        lines.append(lang.get("discord.generation.eta_start", timestamp=int(status_update["eta_start"])))
+    if status_update.get("eta_completion"):
+        lines.append(lang.get("discord.generation.eta_completion", timestamp=int(status_update["eta_completion"])))
+    if status_update.get("steps_per_second"):
+        lines.append(lang.get("discord.generation.speed", steps_per_second=f"{status_update['steps_per_second']:.2f}"))
+    return "\n".join(lines)
+
 async def get_quality_choices(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
     try:
         quality_steps = config.get_quality_steps()
@@ -41,6 +54,26 @@ async def get_ratio_choices(interaction: discord.Interaction, current: str) -> L
     except ConfigError:
         return []
 
+async def fetch_preview(api_client: ApiClient, preview_url: str) -> Optional[discord.File]:
+    try:
+        response = await api_client.get(preview_url)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Failed to download preview: {e}")
+        return None
+    if response.status != 200:
+        return None
+    
+    extension = os.path.splitext(preview_url.split('?')[0])[1]
+    return discord.File(io.BytesIO(response.body), filename=f"preview{extension}")
+
+async def cancel_task(api_client: ApiClient, task_id: str):
+    try:
+        response = await api_client.delete(f"/generator/{task_id}")
+        if response.status not in (200, 404, 409):
+            logger.warning(f"Failed to cancel task {task_id}: {response.status}")
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Failed to cancel task {task_id}: {e}")
+
 async def create_image_command(
     interaction: discord.Interaction,
     prompt: str,
@@ -52,7 +85,6 @@ async def create_image_command(
     try:
         quality_steps = config.get_quality_steps()
         aspect_ratios = config.get_aspect_ratios()
-        api_endpoint = config.get_api_endpoint()
         guild_ids = config.get_guild_ids()
         
     except ConfigError as e:
@@ -94,27 +126,53 @@ async def create_image_command(
 
     await interaction.response.defer(ephemeral=private)
     
+    api_client: ApiClient = interaction.client.api_client
+    status_stream: StatusStream = interaction.client.status_stream
+    edit_coalescer: EditCoalescer = interaction.client.edit_coalescer
+    trace_id = tracer.start_trace()
+    command_started = time.time()
+    task_id = None
     try:
-        enhanced_prompt = await prompt_enhancer.enhance_prompt(prompt)
+        with tracer.span("enhance"):
+            enhanced_prompt = await prompt_enhancer.enhance_prompt(prompt)
         logger.info(f"Prompt enhanced: '{prompt}' -> '{enhanced_prompt}'")
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{api_endpoint}/generator",
-                json={
-                    "prompt": enhanced_prompt,
-                    "quality": quality,
-                    "aspect_ratio": ratio
-                }
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error(f"API error {response.status}: {error_text}")
-                    await interaction.followup.send(lang.get("discord.errors.general"))
-                    return
-                
-                result = await response.json()
-                task_id = result["task_id"]
+        payload = {
+            "prompt": enhanced_prompt,
+            "quality": quality,
+            "aspect_ratio": ratio,
+            "user_id": str(interaction.user.id)
+        }
+        if interaction.guild_id:
+            payload["guild_id"] = str(interaction.guild_id)
+        priority = config.get_guild_priority(interaction.guild_id)
+        if priority:
+            payload["priority"] = priority
+        output_format = config.get_output_format()
+        if output_format:
+            payload["output_format"] = output_format
+        
+        submit_started = time.time()
+        response = await api_client.post("/generator", json=payload, headers={"X-Trace-Id": trace_id})
+        if response.status == 429:
+            retry_after = response.headers.get("Retry-After", "60")
+            logger.warning(f"API rejected request, retry after {retry_after}s")
+            await interaction.followup.send(embed=template_loader.create_embed(
+                "error",
+                title=lang.get("discord.generation.title_busy"),
+                description=lang.get("discord.generation.description_busy", retry_after=retry_after),
+                author_name=interaction.user.display_name,
+                author_icon_url=interaction.user.display_avatar.url
+            ), ephemeral=True)
+            return
+        
+        if response.status != 200:
+            logger.error(f"API error {response.status}: {response.text()}")
+            await interaction.followup.send(lang.get("discord.errors.general"))
+            return
+        
+        task_id = response.json()["task_id"]
+        tracer.record("api.submit", submit_started, time.time() - submit_started, task_id=task_id)
         
         embed = template_loader.create_embed(
             "queue",
@@ -126,13 +184,15 @@ async def create_image_command(
         
         message = await interaction.followup.send(embed=embed, ephemeral=private)
         
-        ws_url = api_endpoint.replace('http://', 'ws://').replace('https://', 'wss://') + f"/ws/{task_id}"
-        
-        async with websockets.connect(ws_url) as websocket:
+        wait_started = time.time()
+        # Progress updates repeat the preview URL until a new preview is rendered
+        last_preview_url = None
+        preview_filename = None
+        updates = await status_stream.subscribe(task_id)
+        try:
             while True:
                 try:
-                    data = await asyncio.wait_for(websocket.recv(), timeout=120.0)
-                    status_update = json.loads(data)
+                    status_update = await asyncio.wait_for(updates.get(), timeout=120.0)
                     
                     if status_update.get("status") == "processing":
                         description = ""
@@ -140,6 +200,9 @@ async def create_image_command(
                         max_quality_value = max(quality_steps.values())
                         if quality_value == max_quality_value:
                             description = lang.get("discord.generation.high_quality_warning")
+                        eta = format_eta(status_update)
+                        if eta:
+                            description = f"{description}\n{eta}" if description else eta
                         
                         embed = template_loader.create_embed(
                             "processing",
@@ -148,75 +211,103 @@ async def create_image_command(
                             author_name=interaction.user.display_name,
                             author_icon_url=interaction.user.display_avatar.url
                         )
-                        await message.edit(embed=embed)
+                        
+                        preview = None
+                        preview_url = status_update.get("preview_url")
+                        if preview_url and preview_url != last_preview_url and config.get_show_previews():
+                            preview = await fetch_preview(api_client, preview_url)
+                            if preview:
+                                last_preview_url = preview_url
+                                preview_filename = preview.filename
+                        
+                        # The message keeps its last preview attachment, so the rebuilt embed points at it again
+                        if preview_filename:
+                            embed.set_image(url=f"attachment://{preview_filename}")
+                        if preview:
+                            edit_coalescer.update(message, embed=embed, attachments=[preview])
+                        else:
+                            edit_coalescer.update(message, embed=embed)
                     elif status_update.get("status") == "queued" and "queue_position" in status_update:
                         embed = template_loader.create_embed(
                             "queue",
                             title=lang.get("discord.generation.title_queue", queue_position=str(status_update["queue_position"])),
-                            description="",
+                            description=format_eta(status_update),
                             author_name=interaction.user.display_name,
                             author_icon_url=interaction.user.display_avatar.url
                         )
-                        await message.edit(embed=embed)
+                        edit_coalescer.update(message, embed=embed)
+                    
+                    if status_update.get("status") in ("completed", "error", "cancelled"):
+                        tracer.record(
+                            "api.wait", wait_started, time.time() - wait_started,
+                            task_id=task_id, status=status_update["status"]
+                        )
                     
                     if status_update.get("status") == "completed":
-                        image_url = api_endpoint + status_update['image_url']
+                        image_filename = "generated_image" + os.path.splitext(status_update['image_url'])[1]
                         
-                        async with aiohttp.ClientSession() as session:
-                            async with session.get(image_url) as img_response:
-                                if img_response.status == 200:
-                                    image_data = await img_response.read()
-                                    file = discord.File(io.BytesIO(image_data), filename="generated_image.png")
-                                    
-                                    if sensitive:
-                                        view = discord.ui.View()
-                                        button = discord.ui.Button(label=lang.get("discord.generation.sensitive_warning_button_label"), style=discord.ButtonStyle.primary, custom_id=f"show_sensitive_image_{task_id}")
-                                        
-                                        async def button_callback(interaction: discord.Interaction):
-                                            ephemeral_file = discord.File(io.BytesIO(image_data), filename="generated_image.png")
-                                            success_embed = template_loader.create_embed(
-                                                "success",
-                                                title=lang.get("discord.generation.title_success"),
-                                                description="",
-                                                author_name=interaction.user.display_name,
-                                                author_icon_url=interaction.user.display_avatar.url,
-                                                footer_text=prompt
-                                            )
-                                            await interaction.response.send_message(embed=success_embed, file=ephemeral_file, ephemeral=True)
-                                        
-                                        button.callback = button_callback
-                                        view.add_item(button)
-                                        
-                                        embed = template_loader.create_embed(
-                                            "sensitive_warning",
-                                            title=lang.get("discord.generation.sensitive_warning_title"),
-                                            description=lang.get("discord.generation.sensitive_warning_description"),
-                                            author_name=interaction.user.display_name,
-                                            author_icon_url=interaction.user.display_avatar.url
-                                        )
-                                        await message.edit(embed=embed, view=view, attachments=[])
-                                    else:
-                                        final_embed = template_loader.create_embed(
-                                            "success",
-                                            title=lang.get("discord.generation.title_success"),
-                                            description="",
-                                            author_name=interaction.user.display_name,
-                                            author_icon_url=interaction.user.display_avatar.url,
-                                            footer_text=prompt
-                                        )
-                                        await message.edit(embed=final_embed, attachments=[file])
-                                else:
-                                    logger.error(f"Failed to download image: {img_response.status}")
-                                    await message.edit(embed=template_loader.create_embed(
-                                        "error",
-                                        title=lang.get("discord.generation.title_failed"),
-                                        description=lang.get("discord.generation.description_failed"),
+                        download_started = time.time()
+                        image_response = await api_client.get(status_update['image_url'])
+                        if image_response.status == 200:
+                            image_data = image_response.body
+                            tracer.record(
+                                "image.download", download_started, time.time() - download_started,
+                                task_id=task_id, bytes=len(image_data)
+                            )
+                            file = discord.File(io.BytesIO(image_data), filename=image_filename)
+                            
+                            if sensitive:
+                                view = discord.ui.View()
+                                button = discord.ui.Button(label=lang.get("discord.generation.sensitive_warning_button_label"), style=discord.ButtonStyle.primary, custom_id=f"show_sensitive_image_{task_id}")
+                                
+                                async def button_callback(interaction: discord.Interaction):
+                                    ephemeral_file = discord.File(io.BytesIO(image_data), filename=image_filename)
+                                    success_embed = template_loader.create_embed(
+                                        "success",
+                                        title=lang.get("discord.generation.title_success"),
+                                        description="",
                                         author_name=interaction.user.display_name,
-                                        author_icon_url=interaction.user.display_avatar.url
-                                    ))
+                                        author_icon_url=interaction.user.display_avatar.url,
+                                        footer_text=prompt,
+                                        image_filename=image_filename
+                                    )
+                                    await interaction.response.send_message(embed=success_embed, file=ephemeral_file, ephemeral=True)
+                                
+                                button.callback = button_callback
+                                view.add_item(button)
+                                
+                                embed = template_loader.create_embed(
+                                    "sensitive_warning",
+                                    title=lang.get("discord.generation.sensitive_warning_title"),
+                                    description=lang.get("discord.generation.sensitive_warning_description"),
+                                    author_name=interaction.user.display_name,
+                                    author_icon_url=interaction.user.display_avatar.url
+                                )
+                                await edit_coalescer.final(message, embed=embed, view=view, attachments=[])
+                            else:
+                                final_embed = template_loader.create_embed(
+                                    "success",
+                                    title=lang.get("discord.generation.title_success"),
+                                    description="",
+                                    author_name=interaction.user.display_name,
+                                    author_icon_url=interaction.user.display_avatar.url,
+                                    footer_text=prompt,
+                                    image_filename=image_filename
+                                )
+                                with tracer.span("discord.upload", task_id=task_id):
+                                    await edit_coalescer.final(message, embed=final_embed, attachments=[file])
+                        else:
+                            logger.error(f"Failed to download image: {image_response.status}")
+                            await edit_coalescer.final(message, embed=template_loader.create_embed(
+                                "error",
+                                title=lang.get("discord.generation.title_failed"),
+                                description=lang.get("discord.generation.description_failed"),
+                                author_name=interaction.user.display_name,
+                                author_icon_url=interaction.user.display_avatar.url
+                            ))
                         break
                     
-                    elif status_update.get("status") == "error":
+                    elif status_update.get("status") in ("error", "cancelled"):
                         error_embed = template_loader.create_embed(
                             "error",
                             title=lang.get("discord.generation.title_failed"),
@@ -224,12 +315,13 @@ async def create_image_command(
                             author_name=interaction.user.display_name,
                             author_icon_url=interaction.user.display_avatar.url
                         )
-                        await message.edit(embed=error_embed)
+                        await edit_coalescer.final(message, embed=error_embed, attachments=[])
                         break
                         
                 except asyncio.TimeoutError:
-                    logger.error(f"WebSocket timeout for task {task_id}")
-                    await message.edit(embed=template_loader.create_embed(
+                    logger.error(f"Status update timeout for task {task_id}")
+                    await cancel_task(api_client, task_id)
+                    await edit_coalescer.final(message, embed=template_loader.create_embed(
                         "error",
                         title=lang.get("discord.generation.title_failed"),
                         description=lang.get("discord.generation.description_failed"),
@@ -237,9 +329,14 @@ async def create_image_command(
                         author_icon_url=interaction.user.display_avatar.url
                     ))
                     break
-                except websockets.exceptions.ConnectionClosed:
-                    break
+        finally:
+            edit_coalescer.discard(message)
+            await status_stream.unsubscribe(task_id)
     
     except Exception as e:
         logger.error(f"Unexpected error in create command: {e}", exc_info=True)
-        await interaction.followup.send(lang.get("discord.errors.general"), ephemeral=True)
\ No newline at end of file
+        if task_id:
+            await cancel_task(api_client, task_id)
+        await interaction.followup.send(lang.get("discord.errors.general"), ephemeral=True)
+    finally:
+        tracer.record("command.total", command_started, time.time() - command_started, task_id=task_id)
\ No newline at end of file
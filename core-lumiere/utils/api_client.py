@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import random
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "DELETE")
+
+class ApiResponse:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+class ApiClient:
+    """Bot-wide pooled HTTP client for the LUMIERE API
+
+    One keep-alive connection pool is shared by every command. Transient failures
+    are retried with exponentially growing, fully jittered delays. Non-idempotent
+    requests are retried only when the request provably never reached the API,
+    so a flaky network can't queue the same generation twice.
+    """
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.endpoint = ""
+        self.settings: Dict[str, Any] = {}
+
+    async def start(self):
+        if self.session is not None:
+            return
+        self.endpoint = config.get_api_endpoint().rstrip('/')
+        self.settings = config.get_http_settings()
+        connector = aiohttp.TCPConnector(
+            limit=self.settings["max_connections"],
+            limit_per_host=self.settings["max_connections_per_host"],
+            keepalive_timeout=self.settings["keepalive_timeout"],
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.settings["total_timeout"],
+            connect=self.settings["connect_timeout"],
+            sock_read=self.settings["read_timeout"]
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        logger.info(f"API client started for {self.endpoint}")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            logger.info("API client closed")
+
+    def url(self, path: str) -> str:
+        return self.endpoint + path
+
+    def _should_retry(self, method: str, error: Optional[Exception], status: Optional[int]) -> bool:
+        if error is not None:
+            if method in IDEMPOTENT_METHODS:
+                return True
+            return isinstance(error, aiohttp.ClientConnectorError)
+        # A proxy may answer 5xx after forwarding, so only idempotent requests are retried on status
+        return status in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.settings["backoff_max"], self.settings["backoff_base"] * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    async def request(self, method: str, path: str, **kwargs) -> ApiResponse:
+        """Send a request to the API and read the whole response body"""
+        await self.start()
+        method = method.upper()
+        retries = self.settings["retries"]
+
+        for attempt in range(retries + 1):
+            error = None
+            result = None
+            try:
+                async with self.session.request(method, self.url(path), **kwargs) as response:
+                    result = ApiResponse(response.status, dict(response.headers), await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+
+            if attempt == retries or not self._should_retry(method, error, result.status if result else None):
+                if error is not None:
+                    raise error
+                return result
+
+            delay = self._backoff(attempt)
+            logger.warning(
+                f"{method} {path} failed ({error or result.status}), retrying in {delay:.2f}s "
+                f"({attempt + 1}/{retries})"
+            )
+            await asyncio.sleep(delay)
+
+    async def get(self, path: str, **kwargs) -> ApiResponse:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> ApiResponse:
+        return await self.request("POST", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> ApiResponse:
+        return await self.request("DELETE", path, **kwargs)
+
+    def websocket(self, path: str, **kwargs):
+        """Open a websocket to the API over the shared session"""
+        url = self.url(path).replace('http://', 'ws://', 1).replace('https://', 'wss://', 1)
+        return self.session.ws_connect(url, heartbeat=self.settings["websocket_heartbeat"], **kwargs)
@@ -53,6 +53,31 @@ class Config:
             raise ConfigError("API endpoint not found in config.json")
         return core_config['api']['endpoint']
     
+    def get_output_format(self) -> str:
+        core_config = self.get_core_config()
+        return core_config.get('api', {}).get('output_format', "")
+    
+    def get_show_previews(self) -> bool:
+        core_config = self.get_core_config()
+        return core_config.get('api', {}).get('show_previews', False)
+    
+    def get_http_settings(self) -> Dict[str, Any]:
+        core_config = self.get_core_config()
+        settings = {
+            "max_connections": 20,
+            "max_connections_per_host": 10,
+            "keepalive_timeout": 30,
+            "connect_timeout": 5,
+            "read_timeout": 60,
+            "total_timeout": None,
+            "retries": 3,
+            "backoff_base": 0.25,
+            "backoff_max": 4,
+            "websocket_heartbeat": 30
+        }
+        settings.update(core_config.get('api', {}).get('http', {}))
+        return settings
+    
     def get_quality_steps(self) -> Dict[str, int]:
         api_config = self.get_api_config()
         if 'generation' not in api_config:
@@ -81,6 +106,43 @@ class Config:
         discord_config = self.get_discord_config()
         return discord_config.get('guild_ids', [])
     
+    def get_guild_priority(self, guild_id: int) -> str:
+        discord_config = self.get_discord_config()
+        return discord_config.get('guild_priorities', {}).get(str(guild_id), "")
+    
+    def get_message_edit_settings(self) -> Dict[str, Any]:
+        core_config = self.get_core_config()
+        settings = {
+            "min_interval": 1.5,
+            "rate": 4.0,
+            "burst": 5
+        }
+        settings.update(core_config.get('discord', {}).get('message_edits', {}))
+        return settings
+    
+    def get_prompt_cache_settings(self) -> Dict[str, Any]:
+        core_config = self.get_core_config()
+        settings = {
+            "enabled": True,
+            "cache_enhancement": False,
+            "path": os.path.join("cache", "prompts.sqlite3"),
+            "ttl_seconds": 7 * 24 * 3600,
+            "memory_entries": 1024,
+            "disk_entries": 50000
+        }
+        settings.update(core_config.get('prompt_cache', {}))
+        settings["path"] = os.path.join(os.path.dirname(self.config_path), settings["path"])
+        return settings
+    
+    def get_tracing_enabled(self) -> bool:
+        core_config = self.get_core_config()
+        return core_config.get('tracing', {}).get('enabled', False)
+    
+    def get_tracing_path(self) -> str:
+        core_config = self.get_core_config()
+        path = core_config.get('tracing', {}).get('path', os.path.join("traces", "bot.jsonl"))
+        return os.path.join(os.path.dirname(self.config_path), path)
+    
     def get_language(self) -> str:
         core_config = self.get_core_config()
         return core_config.get('language', 'ko')
@@ -112,6 +174,24 @@ class Config:
             raise ConfigError("'system_prompt' not found in enhancer config")
         return enhancer_config['system_prompt']
     
+    def get_enhancer_fold_translation(self) -> bool:
+        core_config = self.get_core_config()
+        return core_config.get('enhancer', {}).get('fold_translation', False)
+    
+    def get_genai_settings(self) -> Dict[str, Any]:
+        core_config = self.get_core_config()
+        settings = {
+            "base_url": "",
+            "timeout": 15.0,
+            "max_concurrency": 4,
+            "hedge_after": 3.0,
+            "max_attempts": 2,
+            "breaker_failures": 5,
+            "breaker_reset_seconds": 30.0
+        }
+        settings.update(core_config.get('genai', {}))
+        return settings
+    
     def get_translator_api_key(self) -> str:
         core_config = self.get_core_config()
         if 'translator' not in core_config:
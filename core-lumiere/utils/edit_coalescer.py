@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import discord
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+class EditCoalescer:
+    """Rate-limited, latest-wins message edits shared by every command
+
+    Progress edits only replace the pending edit for their message, which is
+    flushed at most once per min_interval. All flushes draw from one token bucket
+    so the bot stays under Discord's edit limits instead of sleeping on 429s.
+    Final edits (success, error) drop whatever is pending for the message, take
+    the next token ahead of any progress edit and are awaited by the caller.
+    """
+
+    def __init__(self):
+        self.min_interval = 1.5
+        self.rate = 4.0
+        self.burst = 5
+        self._configured = False
+        self._pending: "OrderedDict[int, Tuple[discord.Message, Dict]]" = OrderedDict()
+        self._last_edit: Dict[int, float] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._tokens = 0.0
+        self._refilled_at: Optional[float] = None
+        self._priority_waiters = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def _configure(self):
+        if self._configured:
+            return
+        settings = config.get_message_edit_settings()
+        self.min_interval = settings["min_interval"]
+        self.rate = settings["rate"]
+        self.burst = settings["burst"]
+        self._tokens = float(self.burst)
+        self._configured = True
+
+    def update(self, message: discord.Message, **edit_kwargs):
+        """Queue a progress edit, replacing any edit still pending for the same message"""
+        self._configure()
+        pending = self._pending.get(message.id)
+        if pending is not None and "attachments" in pending[1] and "attachments" not in edit_kwargs:
+            # Files of the replaced edit haven't been uploaded yet; later edits rely on them
+            edit_kwargs["attachments"] = pending[1]["attachments"]
+        self._pending[message.id] = (message, edit_kwargs)
+        self._wakeup.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def final(self, message: discord.Message, **edit_kwargs):
+        """Apply a terminal edit now, ahead of pending progress edits, and stop tracking the message"""
+        self._configure()
+        self._pending.pop(message.id, None)
+        async with self._lock_for(message.id):
+            await self._acquire(priority=True)
+            try:
+                await message.edit(**edit_kwargs)
+            finally:
+                self._last_edit.pop(message.id, None)
+                self._locks.pop(message.id, None)
+
+    def _lock_for(self, message_id: int) -> asyncio.Lock:
+        lock = self._locks.get(message_id)
+        if lock is None:
+            lock = self._locks[message_id] = asyncio.Lock()
+        return lock
+
+    def _refill(self):
+        now = asyncio.get_event_loop().time()
+        if self._refilled_at is not None:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    async def _acquire(self, priority: bool = False):
+        if priority:
+            self._priority_waiters += 1
+        try:
+            while True:
+                self._refill()
+                if self._tokens >= 1 and (priority or self._priority_waiters == 0):
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep(max((1 - self._tokens) / self.rate, 0.05))
+        finally:
+            if priority:
+                self._priority_waiters -= 1
+
+    async def _flush_loop(self):
+        loop = asyncio.get_event_loop()
+        while self._pending:
+            now = loop.time()
+            ready_at = {
+                message_id: self._last_edit.get(message_id, 0) + self.min_interval
+                for message_id in self._pending
+            }
+            message_id = min(ready_at, key=ready_at.get)
+            if ready_at[message_id] > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=ready_at[message_id] - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._acquire()
+            entry = self._pending.pop(message_id, None)
+            if entry is None:
+                # A final edit took over this message while we waited for a token; give the token back
+                self._tokens = min(float(self.burst), self._tokens + 1)
+                continue
+
+            message, edit_kwargs = entry
+            async with self._lock_for(message_id):
+                self._last_edit[message_id] = loop.time()
+                try:
+                    await message.edit(**edit_kwargs)
+                except discord.HTTPException as e:
+                    logger.warning(f"Failed to update message {message_id}: {e}")
+
+    def discard(self, message: discord.Message):
+        """Drop a pending edit and stop tracking the message, e.g. after the command failed"""
+        self._pending.pop(message.id, None)
+        self._last_edit.pop(message.id, None)
+        lock = self._locks.get(message.id)
+        if lock is not None and not lock.locked():
+            del self._locks[message.id]
+
+    async def close(self):
+        self._pending.clear()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
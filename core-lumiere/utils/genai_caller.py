@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpen(Exception):
+    """The upstream model failed repeatedly; callers should fall back without waiting"""
+
+class Overloaded(Exception):
+    """Every concurrency slot for the model stayed busy for a whole timeout; callers should fall back"""
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive errors and lets one trial call through after `reset_seconds`"""
+
+    def __init__(self, failures: int, reset_seconds: float):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_abandoned(self):
+        """The caller gave up on its own, which says nothing about the upstream"""
+        self._trial_running = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._trial_running or self.consecutive_failures >= self.failures:
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+class GenAICaller:
+    """Native async generate_content calls with per-model limits
+
+    Calls go through client.aio, so they don't occupy the default thread pool.
+    Each model gets its own concurrency semaphore and circuit breaker. A call
+    takes a semaphore slot first and only then starts its hard deadline, so time
+    spent waiting behind local calls never trips the breaker. When an attempt
+    hasn't answered after hedge_after seconds, or fails early, another attempt
+    is started within the same slot and the first good answer wins, up to
+    max_attempts per call.
+    """
+
+    def __init__(self):
+        self.settings: Dict[str, Any] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _configure(self):
+        if not self.settings:
+            self.settings = config.get_genai_settings()
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        self._configure()
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(
+                self.settings["breaker_failures"], self.settings["breaker_reset_seconds"]
+            )
+        return breaker
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model)
+        if semaphore is None:
+            semaphore = self._semaphores[model] = asyncio.Semaphore(self.settings["max_concurrency"])
+        return semaphore
+
+    async def _attempt(self, client, model: str, contents, config_data) -> Optional[str]:
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=config_data,
+        )
+        return response.text.strip() if response.text else None
+
+    async def _hedged(self, client, model: str, contents, config_data) -> Optional[str]:
+        hedge_after = self.settings["hedge_after"]
+        max_attempts = max(1, self.settings["max_attempts"])
+        attempts = set()
+        started = 0
+        last_error: Optional[BaseException] = None
+
+        try:
+            while True:
+                if started < max_attempts and (not attempts or hedge_after > 0):
+                    if started:
+                        logger.info(f"Hedging {model} request (attempt {started + 1}/{max_attempts})")
+                    attempts.add(asyncio.create_task(self._attempt(client, model, contents, config_data)))
+                    started += 1
+                if not attempts:
+                    raise last_error
+
+                timeout = hedge_after if started < max_attempts and hedge_after > 0 else None
+                done, attempts = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    last_error = attempt.exception()
+                    logger.warning(f"{model} request failed: {last_error}")
+                    if hedge_after <= 0 and started < max_attempts:
+                        # Without hedging a failed attempt is simply retried
+                        attempts.add(asyncio.create_task(self._attempt(client, model, contents, config_data)))
+                        started += 1
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def generate(self, client, model: str, contents, config_data) -> Optional[str]:
+        """Return the response text, raising CircuitOpen without calling out while the model is degraded"""
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            raise CircuitOpen(f"{model} circuit is {breaker.state}")
+
+        semaphore = self._semaphore(model)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.settings["timeout"])
+        except asyncio.TimeoutError:
+            # Local saturation says nothing about the upstream
+            breaker.record_abandoned()
+            raise Overloaded(f"No {model} slot freed within {self.settings['timeout']}s")
+        except asyncio.CancelledError:
+            breaker.record_abandoned()
+            raise
+
+        try:
+            text = await asyncio.wait_for(
+                self._hedged(client, model, contents, config_data),
+                timeout=self.settings["timeout"]
+            )
+        except Exception:
+            breaker.record_failure()
+            if breaker.state != "closed":
+                logger.warning(f"{model} circuit opened after {breaker.consecutive_failures} failures")
+            raise
+        except asyncio.CancelledError:
+            breaker.record_abandoned()
+            raise
+        finally:
+            semaphore.release()
+
+        breaker.record_success()
+        return text
+
+genai_caller = GenAICaller()
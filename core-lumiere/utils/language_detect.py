@@ -0,0 +1,45 @@
+"""Local script detection deciding whether a prompt needs translating
+
+Runs in microseconds with no network use. A prompt is treated as English when
+its letters are Latin; Hangul, CJK or any other script needs translation.
+Accents from Latin-1 and Latin Extended-A are common in English prompts
+("crème brûlée", "Pokémon", "Dvořák") and count as plain Latin, so only letters
+beyond those blocks, mostly Vietnamese, make a Latin prompt non-English.
+Romanised Korean and other Latin-script languages read as English; the
+enhancer copes with them.
+"""
+
+# Letters outside Latin-1 and Latin Extended-A allowed before a Latin prompt counts as another language
+MAX_EXTENDED_RATIO = 0.05
+
+def _script(character: str) -> str:
+    code = ord(character)
+    if code <= 0x17F:
+        return "latin"
+    if 0xAC00 <= code <= 0xD7A3 or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+        return "hangul"
+    if code <= 0x24F or 0x1E00 <= code <= 0x1EFF:
+        return "extended"
+    return "other"
+
+def detect_script(text: str) -> str:
+    """Dominant script of the letters in text: "english", "hangul", "other" or "none" without letters"""
+    if text.isascii():
+        return "english" if any(character.isalpha() for character in text) else "none"
+
+    counts = {"latin": 0, "hangul": 0, "extended": 0, "other": 0}
+    for character in text:
+        if character.isalpha():
+            counts[_script(character)] += 1
+
+    letters = sum(counts.values())
+    if not letters:
+        return "none"
+    if counts["hangul"] or counts["other"]:
+        return "hangul" if counts["hangul"] >= counts["other"] else "other"
+    if counts["extended"] / letters > MAX_EXTENDED_RATIO:
+        return "other"
+    return "english"
+
+def needs_translation(text: str) -> bool:
+    return detect_script(text) not in ("english", "none")
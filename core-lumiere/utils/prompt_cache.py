@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+class PromptCache:
+    """Two-level cache for model responses to prompts
+
+    A small in-memory LRU sits in front of a SQLite table that survives restarts.
+    Both levels expire entries after ttl_seconds and are bounded in size; the disk
+    level drops its least recently used rows when it grows past disk_entries.
+    SQLite is only touched from one dedicated thread so lookups never block the
+    event loop. Keys hash the model and system prompt together with the text, so
+    changing either in config.json invalidates old entries.
+    """
+
+    def __init__(self):
+        self.settings: Dict[str, Any] = {}
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    def _start(self):
+        if self._executor is not None:
+            return
+        self.settings = config.get_prompt_cache_settings()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prompt-cache")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            path = self.settings["path"]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS prompt_cache_accessed ON prompt_cache (accessed_at)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def _count(self, namespace: str, outcome: str):
+        counters = self._stats.setdefault(namespace, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def _remember(self, namespace: str, key: str, value: str, expires_at: float):
+        self._memory[(namespace, key)] = (value, expires_at)
+        self._memory.move_to_end((namespace, key))
+        while len(self._memory) > self.settings["memory_entries"]:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, namespace: str, key: str) -> Optional[Tuple[str, float]]:
+        connection = self._connect()
+        now = time.time()
+        row = connection.execute(
+            "SELECT value, expires_at FROM prompt_cache WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            connection.execute("DELETE FROM prompt_cache WHERE namespace = ? AND key = ?", (namespace, key))
+            connection.commit()
+            return None
+        connection.execute(
+            "UPDATE prompt_cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (now, namespace, key)
+        )
+        connection.commit()
+        return row[0], row[1]
+
+    def _disk_set(self, namespace: str, key: str, value: str, expires_at: float):
+        connection = self._connect()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO prompt_cache (namespace, key, value, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, value, expires_at, now)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            connection.execute("DELETE FROM prompt_cache WHERE expires_at <= ?", (now,))
+            connection.execute(
+                "DELETE FROM prompt_cache WHERE rowid IN ("
+                "SELECT rowid FROM prompt_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.settings["disk_entries"],)
+            )
+        connection.commit()
+
+    async def get(self, namespace: str, key: str) -> Optional[str]:
+        self._start()
+        entry = self._memory.get((namespace, key))
+        if entry is not None:
+            if entry[1] > time.time():
+                self._memory.move_to_end((namespace, key))
+                self._count(namespace, "memory_hits")
+                return entry[0]
+            del self._memory[(namespace, key)]
+
+        try:
+            entry = await asyncio.get_event_loop().run_in_executor(self._executor, self._disk_get, namespace, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Prompt cache read failed: {e}")
+            entry = None
+
+        if entry is None:
+            self._count(namespace, "misses")
+            return None
+        self._remember(namespace, key, *entry)
+        self._count(namespace, "disk_hits")
+        return entry[0]
+
+    async def set(self, namespace: str, key: str, value: str):
+        self._start()
+        expires_at = time.time() + self.settings["ttl_seconds"]
+        self._remember(namespace, key, value, expires_at)
+        try:
+            await asyncio.get_event_loop().run_in_executor(
+                self._executor, self._disk_set, namespace, key, value, expires_at
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Prompt cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-namespace hit counters and hit rate since start"""
+        result = {}
+        for namespace, counters in self._stats.items():
+            lookups = sum(counters.values())
+            hits = counters["memory_hits"] + counters["disk_hits"]
+            result[namespace] = {**counters, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+        return result
+
+    def close(self):
+        if self._stats:
+            logger.info(f"Prompt cache stats: {self.stats()}")
+        if self._executor is not None:
+            if self._connection is not None:
+                self._executor.submit(self._connection.close).result()
+                self._connection = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+prompt_cache = PromptCache()
@@ -1,4 +1,3 @@
-import asyncio
 import json
 import logging
 from typing import Optional
@@ -6,21 +5,48 @@ from google import genai
 from google.genai import types
 
 from .config import config, ConfigError
+from .tracing import tracer
+from .prompt_cache import prompt_cache
+from .language_detect import needs_translation
+from .genai_caller import genai_caller, CircuitOpen, Overloaded
 
 logger = logging.getLogger(__name__)
 
+FOLD_TRANSLATION_INSTRUCTION = (
+    "The entered prompt may be written in any language. "
+    "Understand it in its original language and always write the resulting prompt in English."
+)
+
 class PromptEnhancer:
     def __init__(self):
         self.translator_client: Optional[genai.Client] = None
         self.enhancer_client: Optional[genai.Client] = None
         
+    async def _cached(self, namespace: str, key: str, produce):
+        """Return the cached response for key, or run produce() and cache a non-empty result"""
+        cached = await prompt_cache.get(namespace, key)
+        if cached is not None:
+            logger.debug(f"Prompt cache hit ({namespace})")
+            return cached
+        result = await produce()
+        if result:
+            await prompt_cache.set(namespace, key, result)
+        return result
+    
+    def _create_client(self, api_key: str) -> genai.Client:
+        base_url = config.get_genai_settings()["base_url"]
+        if base_url:
+            # Lets the bot run against tools/genai_stub_server.py or a proxy
+            return genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=base_url))
+        return genai.Client(api_key=api_key)
+    
     def _get_translator_client(self):
         if self.translator_client is None and genai is not None:
             api_key = config.get_translator_api_key()
             if not api_key:
                 logger.warning("Translator API key is empty, skipping translation")
                 return None
-            self.translator_client = genai.Client(api_key=api_key)
+            self.translator_client = self._create_client(api_key)
             logger.info("Translator GenAI client configured")
         return self.translator_client
     
@@ -29,11 +55,15 @@ class PromptEnhancer:
             api_key = config.get_enhancer_api_key()
             if not api_key:
                 raise ConfigError("Enhancer API key is empty")
-            self.enhancer_client = genai.Client(api_key=api_key)
+            self.enhancer_client = self._create_client(api_key)
             logger.info("Enhancer GenAI client configured")
         return self.enhancer_client
     
     async def _translate_to_english(self, text: str) -> str:
+        if not needs_translation(text):
+            logger.debug("Prompt is already English, skipping translation")
+            return text
+        
         client = self._get_translator_client()
         if not client:
             logger.debug("Translator client not available, using original text")
@@ -53,25 +83,28 @@ class PromptEnhancer:
             )
             
             contents = [types.Content(role="user", parts=[types.Part.from_text(text=text)])]
+            model = config.get_translator_model()
             
-            def _translate():
-                response = client.models.generate_content(
-                    model=config.get_translator_model(),
-                    contents=contents,
-                    config=config_data,
-                )
-                return response.text.strip() if response.text else None
+            async def _request_translation():
+                with tracer.span("enhance.translate"):
+                    response_text = await genai_caller.generate(client, model, contents, config_data)
+                
+                if response_text:
+                    try:
+                        return json.loads(response_text).get("translation", "")
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Translation JSON parse error: {e}")
+                return ""
             
-            response_text = await asyncio.get_event_loop().run_in_executor(None, _translate)
+            if config.get_prompt_cache_settings()["enabled"]:
+                key = prompt_cache.make_key(model, config.get_translator_system_prompt(), text)
+                translated = await self._cached("translation", key, _request_translation)
+            else:
+                translated = await _request_translation()
             
-            if response_text:
-                try:
-                    translated = json.loads(response_text).get("translation", "")
-                    if translated:
-                        logger.info(f"Translated prompt: '{text}' -> '{translated}'")
-                        return translated
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Translation JSON parse error: {e}")
+            if translated:
+                logger.info(f"Translated prompt: '{text}' -> '{translated}'")
+                return translated
             
             return text
         except Exception as e:
@@ -84,7 +117,13 @@ class PromptEnhancer:
             return original_prompt
             
         try:
-            translated_prompt = await self._translate_to_english(original_prompt)
+            system_prompt = config.get_enhancer_system_prompt()
+            if config.get_enhancer_fold_translation() and needs_translation(original_prompt):
+                # One remote call instead of two: the enhancer translates while it rewrites
+                translated_prompt = original_prompt
+                system_prompt = f"{system_prompt}\n{FOLD_TRANSLATION_INSTRUCTION}"
+            else:
+                translated_prompt = await self._translate_to_english(original_prompt)
             
             client = self._get_enhancer_client()
             if not client:
@@ -99,32 +138,40 @@ class PromptEnhancer:
                     required=["prompt"],
                     properties={"prompt": genai.types.Schema(type=genai.types.Type.STRING)},
                 ),
-                system_instruction=[types.Part.from_text(text=config.get_enhancer_system_prompt())],
+                system_instruction=[types.Part.from_text(text=system_prompt)],
             )
             
             contents = [types.Content(role="user", parts=[types.Part.from_text(text=translated_prompt)])]
+            model = config.get_enhancer_model()
             
-            def _generate():
-                response = client.models.generate_content(
-                    model=config.get_enhancer_model(),
-                    contents=contents,
-                    config=config_data,
-                )
-                return response.text.strip() if response.text else None
+            async def _request_enhancement():
+                with tracer.span("enhance.generate"):
+                    response_text = await genai_caller.generate(client, model, contents, config_data)
+                
+                if response_text:
+                    try:
+                        return json.loads(response_text).get("prompt", "")
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"JSON parse error: {e}")
+                return ""
             
-            response_text = await asyncio.get_event_loop().run_in_executor(None, _generate)
+            # Enhancement samples at a high temperature, so reusing one result is opt-in
+            cache_settings = config.get_prompt_cache_settings()
+            if cache_settings["enabled"] and cache_settings["cache_enhancement"]:
+                key = prompt_cache.make_key(model, system_prompt, translated_prompt)
+                enhanced_prompt = await self._cached("enhancement", key, _request_enhancement)
+            else:
+                enhanced_prompt = await _request_enhancement()
             
-            if response_text:
-                try:
-                    enhanced_prompt = json.loads(response_text).get("prompt", "")
-                    if enhanced_prompt:
-                        logger.info(f"Prompt enhanced: '{original_prompt}' -> '{enhanced_prompt[:50]}...'")
-                        return enhanced_prompt
-                except json.JSONDecodeError as e:
-                    logger.warning(f"JSON parse error: {e}")
+            if enhanced_prompt:
+                logger.info(f"Prompt enhanced: '{original_prompt}' -> '{enhanced_prompt[:50]}...'")
+                return enhanced_prompt
             
             return original_prompt
                 
+        except (CircuitOpen, Overloaded) as e:
+            logger.warning(f"Enhancer unavailable ({e}), using original prompt")
+            return original_prompt
         except Exception as e:
             logger.error(f"Error enhancing prompt: {e}")
             return original_prompt
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import random
+from typing import Dict, Optional
+
+import aiohttp
+
+from .api_client import ApiClient
+
+logger = logging.getLogger(__name__)
+
+class StatusStream:
+    """One long-lived status websocket shared by every waiting command
+
+    Commands subscribe a task ID and read its updates from their own queue; a
+    single reader routes each pushed {"task_id": ..., **status} message to the
+    right queue. After a dropped connection every active task is subscribed
+    again, and the API answers each subscribe with the current status, so no
+    terminal update is lost.
+    """
+
+    RECONNECT_BASE = 0.5
+    RECONNECT_MAX = 10.0
+
+    def __init__(self, api_client: ApiClient):
+        self.api_client = api_client
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._websocket: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue = self._queues.get(task_id)
+        if queue is None:
+            queue = self._queues[task_id] = asyncio.Queue()
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._run())
+        if self._connected.is_set():
+            await self._send("subscribe", [task_id])
+        return queue
+
+    async def unsubscribe(self, task_id: str):
+        if self._queues.pop(task_id, None) is not None and self._connected.is_set():
+            await self._send("unsubscribe", [task_id])
+
+    async def _send(self, action: str, task_ids):
+        try:
+            await self._websocket.send_json({"action": action, "task_ids": list(task_ids)})
+        except (ConnectionError, RuntimeError, aiohttp.ClientError) as e:
+            # The reader notices the broken socket and resubscribes after reconnecting
+            logger.warning(f"Failed to {action} on status stream: {e}")
+
+    async def _run(self):
+        attempt = 0
+        while self._queues:
+            try:
+                async with self.api_client.websocket("/ws") as websocket:
+                    self._websocket = websocket
+                    self._connected.set()
+                    attempt = 0
+                    logger.info("Status stream connected")
+                    await self._send("subscribe", list(self._queues))
+
+                    async for message in websocket:
+                        if message.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        try:
+                            self._route(json.loads(message.data))
+                        except (ValueError, KeyError, TypeError, AttributeError) as e:
+                            # One bad frame shouldn't drop the stream every waiting command shares
+                            logger.warning(f"Ignoring malformed status stream message {message.data[:200]!r}: {e}")
+                        if not self._queues:
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                logger.warning(f"Status stream connection failed: {e}")
+            finally:
+                self._connected.clear()
+                self._websocket = None
+
+            if self._queues:
+                delay = random.uniform(0, min(self.RECONNECT_MAX, self.RECONNECT_BASE * (2 ** attempt)))
+                attempt += 1
+                logger.info(f"Reconnecting status stream in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        logger.info("Status stream idle, connection closed")
+
+    def _route(self, message: Dict):
+        queue = self._queues.get(message.pop("task_id", None))
+        if queue is not None:
+            queue.put_nowait(message)
+
+    async def close(self):
+        self._queues.clear()
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
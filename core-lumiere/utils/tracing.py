@@ -0,0 +1,75 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+current_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_trace_id", default=None)
+
+class SpanRecorder:
+    """Appends timed spans of a command as JSON lines; the trace ID is forwarded to the API"""
+
+    def __init__(self, service: str):
+        self.service = service
+        self._file = None
+        self._lock = threading.Lock()
+        self._enabled: Optional[bool] = None
+
+    @property
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            try:
+                self._enabled = config.get_tracing_enabled()
+            except Exception:
+                self._enabled = False
+        return self._enabled
+
+    def start_trace(self) -> str:
+        """Create a trace ID and make it current for the calling task"""
+        trace_id = uuid.uuid4().hex
+        current_trace_id.set(trace_id)
+        return trace_id
+
+    def _get_file(self):
+        if self._file is None:
+            path = config.get_tracing_path()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8', buffering=1)
+        return self._file
+
+    def record(self, name: str, start: float, duration: float, trace_id: Optional[str] = None, **attributes):
+        trace_id = trace_id or current_trace_id.get()
+        if not trace_id or not self.enabled:
+            return
+        line = json.dumps({
+            "trace_id": trace_id,
+            "service": self.service,
+            "span": name,
+            "start": round(start, 6),
+            "duration_ms": round(duration * 1000, 3),
+            **attributes
+        }, ensure_ascii=False)
+        try:
+            with self._lock:
+                self._get_file().write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to write trace span: {e}")
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - started, **attributes)
+
+tracer = SpanRecorder("bot")
@@ -0,0 +1,74 @@
+"""Local stand-in for the Gemini generateContent endpoint
+
+Answers every POST .../models/<model>:generateContent with a JSON body holding
+both a "translation" and a "prompt" field derived from the request text, after
+an optional delay, and fails a configurable share of requests. Point the bot at
+it to exercise PromptEnhancer's deadlines, hedging and circuit breaker without
+network access or API keys:
+
+    python tools/genai_stub_server.py --latency 0.2 --jitter 4 --failure-rate 0.2
+
+    "core": {"genai": {"base_url": "http://127.0.0.1:8765"}}
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+def request_text(body: dict) -> str:
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if part.get("text"):
+                return part["text"]
+    return ""
+
+def build_app(latency: float, jitter: float, failure_rate: float, status: int) -> web.Application:
+    counters = {"requests": 0, "failures": 0}
+
+    async def generate_content(request: web.Request) -> web.Response:
+        counters["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(latency + random.uniform(0, jitter))
+
+        if random.random() < failure_rate:
+            counters["failures"] += 1
+            return web.json_response(
+                {"error": {"code": status, "message": "stub failure", "status": "UNAVAILABLE"}},
+                status=status
+            )
+
+        text = request_text(body)
+        answer = json.dumps({"translation": text, "prompt": f"{text}, highly detailed"}, ensure_ascii=False)
+        return web.json_response({
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": answer}]},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "modelVersion": request.match_info["model"]
+        })
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(counters)
+
+    app = web.Application()
+    app.router.add_post("/{version}/models/{model}:generateContent", generate_content)
+    app.router.add_get("/stats", stats)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Gemini generateContent server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1, help="base response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random delay in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with --status")
+    parser.add_argument("--status", type=int, default=503)
+    args = parser.parse_args()
+
+    web.run_app(build_app(args.latency, args.jitter, args.failure_rate, args.status), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Summarise request trace spans written by the bot and the API
+
+Reads the JSON-lines span files (by default traces/*.jsonl next to config.json)
+and prints per-stage latency percentiles, or the timeline of a single trace:
+
+    python tools/trace_report.py
+    python tools/trace_report.py traces/bot.jsonl traces/api.jsonl --json
+    python tools/trace_report.py --trace 3f2a...
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+PERCENTILES = (50, 95, 99)
+
+def load_spans(paths: Iterable[str]) -> List[Dict]:
+    spans = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Skipping malformed line {line_number} in {path}", file=sys.stderr)
+    return spans
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarise(spans: List[Dict]) -> List[Dict]:
+    durations = defaultdict(list)
+    for span in spans:
+        durations[(span.get("service", ""), span["span"])].append(span["duration_ms"])
+
+    rows = []
+    for (service, name), values in durations.items():
+        values.sort()
+        row = {
+            "service": service,
+            "span": name,
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "max_ms": values[-1]
+        }
+        for percent in PERCENTILES:
+            row[f"p{percent}_ms"] = percentile(values, percent)
+        rows.append(row)
+
+    # Slowest stages first, so the one that dominates end-to-end latency is on top
+    rows.sort(key=lambda row: row["p50_ms"], reverse=True)
+    return rows
+
+def print_table(rows: List[Dict], trace_count: int):
+    print(f"{trace_count} traces")
+    header = f"{'service':<8} {'span':<28} {'count':>7} {'p50 ms':>11} {'p95 ms':>11} {'p99 ms':>11} {'max ms':>11}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['service']:<8} {row['span']:<28} {row['count']:>7} {row['p50_ms']:>11.1f} "
+            f"{row['p95_ms']:>11.1f} {row['p99_ms']:>11.1f} {row['max_ms']:>11.1f}"
+        )
+
+def print_trace(spans: List[Dict], trace_id: str):
+    trace = sorted((span for span in spans if span["trace_id"] == trace_id), key=lambda span: span["start"])
+    if not trace:
+        print(f"Trace {trace_id} not found", file=sys.stderr)
+        return
+    origin = trace[0]["start"]
+    for span in trace:
+        offset_ms = (span["start"] - origin) * 1000
+        print(f"{offset_ms:>10.1f} ms  {span.get('service', ''):<4} {span['span']:<28} {span['duration_ms']:>10.1f} ms")
+
+def main():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Per-stage latency report from LUMIERE trace spans")
+    parser.add_argument("paths", nargs="*", help="span files (default: traces/*.jsonl)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    parser.add_argument("--trace", help="print the timeline of one trace ID instead of the summary")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(project_root, "traces", "*.jsonl")))
+    if not paths:
+        parser.error("no span files found; enable tracing or pass paths explicitly")
+
+    spans = load_spans(paths)
+    if args.trace:
+        print_trace(spans, args.trace)
+        return
+
+    rows = summarise(spans)
+    trace_count = len({span["trace_id"] for span in spans})
+    if args.json:
+        print(json.dumps({"traces": trace_count, "spans": rows}, indent=2))
+    else:
+        print_table(rows, trace_count)
+
+if __name__ == "__main__":
+    main()